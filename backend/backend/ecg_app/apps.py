@@ -4,3 +4,32 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ecg_app'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+
+        from . import models
+        from .quiz_payload import track_quiz_payloads
+        from .versions import track_model
+
+        def question_attempt_users(question_attempt):
+            if models.QuestionAttempt.quiz_attempt.is_cached(question_attempt):
+                return [question_attempt.quiz_attempt.user_id]
+            return models.QuizAttempt.objects.filter(pk=question_attempt.quiz_attempt_id).values_list('user_id', flat=True)
+
+        # Cached data embeds the versions of these entities, see versions.py
+        track_model(models.EcgSamples, 'samples')
+        track_model(models.EcgDocLabels, 'doc_labels')
+        track_model(models.EcgSnomed, 'snomed')
+        track_model(models.EcgImageDerivative, 'derivatives')
+        track_model(models.EcgSamplesDocLabels, 'sample_labels')
+        track_model(models.EcgSampleValidation, 'validation')
+        track_model(models.ValidationHistory, 'validation')
+        track_model(models.Quiz, 'quiz')
+        track_model(models.QuizAttempt, 'quiz_attempt', user_ids=lambda quiz_attempt: [quiz_attempt.user_id])
+        track_model(models.QuestionAttempt, 'quiz_attempt', user_ids=question_attempt_users)
+        track_model(User, 'user')
+        track_model(models.Profile, 'user')
+        track_model(models.Group, 'group')
+        track_model(models.GroupMembership, 'group_membership', user_ids=lambda membership: [membership.student_id])
+        track_quiz_payloads()
@@ -0,0 +1,25 @@
+"""
+Cached catalog of the doc labels and SNOMED codes.
+
+Both tables are tiny and nearly static, so they're read once into the shared cache and served
+from there, keyed by the version of their entity (see versions.py). Any change to either
+table bumps that version, and every worker reloads the catalog on its next read.
+"""
+from .models import EcgDocLabels, EcgSnomed
+from .versions import cached_data
+
+CATALOG_TIMEOUT = 60 * 60 * 24
+
+
+def get_doc_labels() -> list[EcgDocLabels]:
+    """All doc labels, ordered by id."""
+    return cached_data('catalog:doc_labels', ['doc_labels'], lambda: list(EcgDocLabels.objects.order_by('label_id')), timeout=CATALOG_TIMEOUT)
+
+
+def get_doc_label(label_id: int) -> EcgDocLabels | None:
+    return next((label for label in get_doc_labels() if label.label_id == label_id), None)
+
+
+def get_snomed_codes() -> list[EcgSnomed]:
+    """All SNOMED codes, ordered by id."""
+    return cached_data('catalog:snomed', ['snomed'], lambda: list(EcgSnomed.objects.order_by('label_id')), timeout=CATALOG_TIMEOUT)
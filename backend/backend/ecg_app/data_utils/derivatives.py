@@ -0,0 +1,99 @@
+import os
+import tempfile
+from collections.abc import Iterable, Iterator
+from multiprocessing import Pool
+from pathlib import Path
+from typing import NamedTuple
+
+from PIL import Image, features
+
+from .pack import open_sample_file, sample_file_hash
+
+# (variant, max width or None for full size, format, Pillow save options)
+DERIVATIVE_SPECS = [
+    ('thumb', 320, 'webp', {'quality': 80, 'method': 6}),
+    ('thumb', 320, 'png', {'optimize': True}),
+    ('medium', 1024, 'webp', {'quality': 85, 'method': 6}),
+    ('medium', 1024, 'png', {'optimize': True}),
+    ('full', None, 'webp', {'lossless': True, 'method': 6}),
+]
+if features.check('avif'):
+    DERIVATIVE_SPECS += [
+        ('thumb', 320, 'avif', {'quality': 60}),
+        ('medium', 1024, 'avif', {'quality': 65}),
+    ]
+
+DERIVATIVE_VARIANTS = ('thumb', 'medium', 'full')
+DERIVATIVE_CONTENT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'png': 'image/png'}
+
+
+class DerivativeJob(NamedTuple):
+    """A source image to derive, its dataset-relative key and the hash of its last derivation."""
+    image_path: Path
+    source_path: str
+    known_hash: str | None = None
+
+
+class Derivative(NamedTuple):
+    source_path: str
+    variant: str
+    format: str
+    path: str
+    width: int
+    height: int
+    size_bytes: int
+    source_hash: str
+
+
+def generate_derivatives(image_path: Path, source_path: str, out_dir: Path, source_hash: str | None = None) -> list[Derivative]:
+    """
+    Write every derivative in DERIVATIVE_SPECS for one source image under `out_dir`.
+
+    Files are stored as "<source_path>.<variant>.<format>" relative to `out_dir`.
+    """
+    source_hash = source_hash or sample_file_hash(image_path)
+    derivatives = []
+    with Image.open(open_sample_file(image_path)) as source:
+        source = source.convert('RGB')
+        for variant, max_width, fmt, options in DERIVATIVE_SPECS:
+            image = source
+            if max_width and source.width > max_width:
+                height = round(source.height * max_width / source.width)
+                image = source.resize((max_width, height), Image.Resampling.LANCZOS)
+
+            relative_path = f"{source_path}.{variant}.{fmt}"
+            path = out_dir / relative_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, format=fmt.upper(), **options)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+
+            derivatives.append(Derivative(
+                source_path, variant, fmt, relative_path, image.width, image.height, path.stat().st_size, source_hash
+            ))
+    return derivatives
+
+
+def _run_job(args: tuple[DerivativeJob, Path]) -> list[Derivative]:
+    job, out_dir = args
+    source_hash = sample_file_hash(job.image_path)
+    if source_hash == job.known_hash:
+        return []
+    return generate_derivatives(job.image_path, job.source_path, out_dir, source_hash)
+
+
+def generate_derivatives_parallel(jobs: Iterable[DerivativeJob], out_dir: Path, workers: int | None = None) -> Iterator[list[Derivative]]:
+    """
+    Generate derivatives for many images in a process pool, yielding each image's derivatives.
+
+    Images whose content hash matches `known_hash` are skipped and yield an empty list.
+    """
+    tasks = ((job, out_dir) for job in jobs)
+    if workers == 1:
+        yield from map(_run_job, tasks)
+        return
+
+    with Pool(processes=workers) as pool:
+        yield from pool.imap_unordered(_run_job, tasks, chunksize=4)
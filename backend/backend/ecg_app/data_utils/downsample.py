@@ -0,0 +1,153 @@
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from .pack import pack_entry
+from .sample import SIGNAL_SUFFIX, hash_file
+from .signal import EcgSignal
+
+# Precomputed level-of-detail widths (points per lead) cached for whole records
+LOD_WIDTHS = (256, 512, 1024, 2048, 4096)
+LOD_METHODS = ('minmax', 'lttb')
+LOD_CACHE_DIR = '.lod'
+# Part of the cached level file names, bumped whenever the downsampling output changes
+LOD_CACHE_VERSION = 2
+
+
+def bucket_edges(n: int, buckets: int) -> np.ndarray:
+    """Sample index edges splitting n samples into `buckets` contiguous buckets whose sizes differ by at most one."""
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+
+def minmax_envelope(data: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    Reduce (leads, n) samples to the min and max of each of `buckets` buckets per lead.
+
+    Bucket i holds samples bucket_edges(n, buckets)[i] up to the next edge, so every bucket has
+    real samples and together they cover the signal. Returns (leads, 2 * buckets) values, with
+    each bucket's min and max kept in the order they occur so spikes such as QRS complexes keep
+    their shape.
+    """
+    leads, n = data.shape
+    buckets = min(buckets, n)
+    edges = bucket_edges(n, buckets)
+    starts, stops = edges[:-1], edges[1:]
+
+    # (buckets, largest bucket) sample indices; shorter buckets repeat their last sample, which
+    # changes neither their min and max nor where these first occur
+    offsets = np.arange((stops - starts).max())
+    indices = np.minimum(starts[:, None] + offsets, stops[:, None] - 1)
+    grouped = data[:, indices]
+
+    arg_min = grouped.argmin(axis=2)
+    arg_max = grouped.argmax(axis=2)
+    mins = np.take_along_axis(grouped, arg_min[..., None], axis=2)[..., 0]
+    maxs = np.take_along_axis(grouped, arg_max[..., None], axis=2)[..., 0]
+
+    min_first = arg_min <= arg_max
+    envelope = np.empty((leads, buckets, 2), dtype=data.dtype)
+    envelope[..., 0] = np.where(min_first, mins, maxs)
+    envelope[..., 1] = np.where(min_first, maxs, mins)
+    return envelope.reshape(leads, 2 * buckets)
+
+
+def lttb(data: np.ndarray, threshold: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets downsampling of (leads, n) samples to `threshold` points per lead.
+
+    Returns the selected values and their sample indices, both shaped (leads, threshold).
+    All leads are processed together, one bucket at a time.
+    """
+    leads, n = data.shape
+    if threshold >= n or threshold < 3:
+        indices = np.broadcast_to(np.arange(n, dtype=np.int32), (leads, n)).copy()
+        return data.copy(), indices
+
+    values = data.astype(np.float64)
+    rows = np.arange(leads)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty((leads, threshold), dtype=np.int32)
+    indices[:, 0] = 0
+    indices[:, -1] = n - 1
+
+    prev = np.zeros(leads, dtype=np.int64)
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_start = stop if i + 2 < len(edges) else n - 1
+
+        # Average point of the next bucket
+        avg_x = (next_start + next_stop - 1) / 2
+        avg_y = values[:, next_start:next_stop].mean(axis=1)
+
+        # Triangle area between the previous point, each candidate and the next average
+        prev_x = prev.astype(np.float64)
+        prev_y = values[rows, prev]
+        xs = np.arange(start, stop, dtype=np.float64)
+        areas = np.abs(
+            (prev_x[:, None] - avg_x) * (values[:, start:stop] - prev_y[:, None])
+            - (prev_x[:, None] - xs[None, :]) * (avg_y - prev_y)[:, None]
+        )
+        prev = start + areas.argmax(axis=1)
+        indices[:, i + 1] = prev
+
+    return np.take_along_axis(data, indices, axis=1), indices
+
+
+def downsample(data: np.ndarray, width: int, method: str = 'minmax') -> dict[str, np.ndarray]:
+    """Downsample (leads, n) samples for a plot `width` pixels wide, returning the payload arrays."""
+    if method == 'lttb':
+        samples, index = lttb(data, width)
+        return {'samples': samples, 'index': index}
+    return {'samples': minmax_envelope(data, width)}
+
+
+@lru_cache(maxsize=4096)
+def _signal_hash(mat_path: str, mtime_ns: int, size: int) -> str:
+    return hash_file(Path(mat_path))
+
+
+def signal_hash(record_path: Path) -> str:
+    """Content hash of a record's .mat file, memoized per (path, mtime, size) or taken from its pack."""
+    mat_path = record_path.with_suffix(SIGNAL_SUFFIX)
+    entry = pack_entry(mat_path)
+    if entry:
+        return entry.sha256
+    stat = mat_path.stat()
+    return _signal_hash(str(mat_path), stat.st_mtime_ns, stat.st_size)
+
+
+def lod_width(width: int) -> int | None:
+    """Round a requested width up to the nearest cached LOD level, or None if it exceeds them all."""
+    return next((level for level in LOD_WIDTHS if level >= width), None)
+
+
+def load_lod_level(record_path: Path, signal: EcgSignal, width: int, method: str = 'minmax') -> dict[str, np.ndarray]:
+    """
+    Return a whole-record LOD level, computing and caching it on first use.
+
+    Levels are stored in a hidden ".lod" directory next to the record, keyed by the content
+    hash of the .mat file, so re-recorded signals never hit a stale level. A read-only
+    dataset directory simply disables the cache.
+    """
+    cache_dir = record_path.parent / LOD_CACHE_DIR
+    cache_path = cache_dir / f"{record_path.name}.{signal_hash(record_path)[:16]}.{method}.v{LOD_CACHE_VERSION}.{width}.npz"
+    try:
+        with np.load(cache_path) as cached:
+            return {name: cached[name] for name in cached.files}
+    except (OSError, ValueError):
+        pass
+
+    arrays = downsample(signal.digital, width, method)
+    try:
+        cache_dir.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return arrays
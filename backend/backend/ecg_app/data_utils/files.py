@@ -0,0 +1,72 @@
+import mimetypes
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+from .pack import pack_entry
+from .sample import hash_file
+
+# Older Python releases don't map the image formats of the derivatives
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+
+
+class FileInfo(NamedTuple):
+    """What an HTTP response needs to know about a served file, without reading it."""
+    path: str
+    size: int
+    mtime: float
+    etag: str
+    content_type: str
+
+
+@lru_cache(maxsize=8192)
+def _file_info(path: str, mtime_ns: int, size: int) -> FileInfo:
+    content_type, _ = mimetypes.guess_type(path)
+    return FileInfo(path, size, mtime_ns / 1e9, f'"{hash_file(Path(path))[:32]}"', content_type or 'application/octet-stream')
+
+
+def get_file_info(path: Path | str) -> FileInfo:
+    """
+    Return the size, mtime, strong ETag and content type of a file.
+
+    Entries are memoized per (path, mtime, size) and revalidated with one stat() per call, so
+    the content hash behind the ETag is only computed again after the file changes. Packed
+    files are described by their pack entry.
+    """
+    entry = pack_entry(Path(path))
+    if entry:
+        content_type, _ = mimetypes.guess_type(str(path))
+        return FileInfo(str(path), entry.length, entry.mtime, f'"{entry.sha256[:32]}"', content_type or 'application/octet-stream')
+
+    stat = os.stat(path)
+    return _file_info(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Parse a single-range "bytes=" Range header into an inclusive (start, end) byte range.
+
+    Returns None when the header is absent, malformed or asks for several ranges, in which
+    case the whole file is served. Raises ValueError when the range can't be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start, sep, end = header[len('bytes='):].strip().partition('-')
+    if not sep or not (start or end) or not (start or '0').isdigit() or not (end or '0').isdigit():
+        return None
+
+    if not start:
+        # Suffix range: the last `end` bytes
+        length = int(end)
+        if length == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise ValueError(f"Range starts past the end of the file ({size} bytes)")
+    return start, min(int(end), size - 1) if end else size - 1
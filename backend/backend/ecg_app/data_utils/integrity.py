@@ -0,0 +1,56 @@
+from collections.abc import Iterable, Iterator
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+
+from .sample import load_header
+from .signal import load_signal
+
+
+def wfdb_checksums(data: np.ndarray) -> np.ndarray:
+    """WFDB checksums of (leads, samples) digital data: per-lead sums wrapped to signed 16 bits."""
+    sums = data.sum(axis=1, dtype=np.int64)
+    return (sums + 32768) % 65536 - 32768
+
+
+def check_signal(record_path: Path) -> list[str]:
+    """
+    Validate the header and signal of a record, returning a description of every problem found.
+
+    Checks that the header parses, that the signal file is as large as the header describes,
+    and that each lead's checksum and initial value match the header.
+    """
+    try:
+        header = load_header(record_path)
+        signal = load_signal(record_path, header)
+    except (OSError, ValueError, IndexError) as e:
+        return [str(e)]
+
+    errors = []
+    if header.num_samples == 0:
+        return errors
+    checksums = wfdb_checksums(signal.digital)
+    for row, spec in enumerate(header.leads):
+        # Header fields are positional, so a checksum implies an explicit initial value before it
+        if spec.checksum is None:
+            continue
+        if checksums[row] != spec.checksum:
+            errors.append(f"Lead {spec.name or row}: checksum {checksums[row]} does not match header checksum {spec.checksum}")
+        if signal.digital[row, 0] != spec.init_value:
+            errors.append(f"Lead {spec.name or row}: first sample {signal.digital[row, 0]} does not match header initial value {spec.init_value}")
+    return errors
+
+
+def _check_signal_pair(record_path: Path) -> tuple[Path, list[str]]:
+    return record_path, check_signal(record_path)
+
+
+def check_signals_parallel(record_paths: Iterable[Path], workers: int | None = None, chunksize: int = 16) -> Iterator[tuple[Path, list[str]]]:
+    """Validate many records in a process pool, yielding (record path, errors) as workers finish."""
+    if workers == 1:
+        yield from map(_check_signal_pair, record_paths)
+        return
+
+    with Pool(processes=workers) as pool:
+        yield from pool.imap_unordered(_check_signal_pair, record_paths, chunksize=chunksize)
@@ -0,0 +1,172 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+# Every dataset directory holds at most one pack, named after these constants
+PACK_NAME = 'dataset.pack'
+PACK_INDEX_NAME = 'dataset.pack.idx'
+PACK_MAGIC = b'ECGPACK1'
+PACK_VERSION = 1
+
+# Members start on 16-byte boundaries so numeric payloads can be viewed in place
+PACK_ALIGNMENT = 16
+
+
+class PackEntry(NamedTuple):
+    """Where a packed file lives in the pack, and the mtime and SHA-256 of the file it was packed from."""
+    offset: int
+    length: int
+    mtime: float
+    sha256: str
+
+
+class PackReader:
+    """
+    Read-only view of the pack of a dataset directory.
+
+    The pack is memory-mapped once and members are returned as zero-copy memoryview slices.
+    The JSON index maps each member's file name (e.g. "Q0001.mat") to its PackEntry.
+    """
+
+    def __init__(self, index_path: Path):
+        with open(index_path, 'rb') as f:
+            index = json.load(f)
+        if index.get('version') != PACK_VERSION:
+            raise ValueError(f"Unsupported pack index version in {index_path}: {index.get('version')}")
+
+        self.pack_path = index_path.with_name(index['pack'])
+        self.members = {name: PackEntry(*entry) for name, entry in index['members'].items()}
+        with open(self.pack_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(PACK_MAGIC)] != PACK_MAGIC:
+            raise ValueError(f"Not a dataset pack: {self.pack_path}")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.members
+
+    def get(self, name: str) -> memoryview | None:
+        entry = self.members.get(name)
+        if entry is None:
+            return None
+        return memoryview(self._mmap)[entry.offset:entry.offset + entry.length]
+
+
+@lru_cache(maxsize=256)
+def _open_pack(index_path: str, mtime_ns: int, size: int) -> PackReader:
+    return PackReader(Path(index_path))
+
+
+def open_pack(ds_dir: Path | str) -> PackReader | None:
+    """
+    Return the pack of a dataset directory, or None if it has none.
+
+    Readers are memoized per (index path, mtime, size) and revalidated with one stat() of the
+    index, so appending to a pack is picked up without a restart.
+    """
+    index_path = os.path.join(ds_dir, PACK_INDEX_NAME)
+    try:
+        stat = os.stat(index_path)
+    except FileNotFoundError:
+        return None
+    return _open_pack(index_path, stat.st_mtime_ns, stat.st_size)
+
+
+def _current_entry(path: Path) -> tuple[PackReader, PackEntry] | None:
+    reader = open_pack(path.parent)
+    entry = reader.members.get(path.name) if reader else None
+    if entry is None:
+        return None
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return reader, entry
+    # A loose file edited or replaced since it was packed wins until it is packed again
+    if stat.st_mtime != entry.mtime or stat.st_size != entry.length:
+        return None
+    return reader, entry
+
+
+def pack_entry(path: Path) -> PackEntry | None:
+    """
+    Return the pack entry of a sample file (e.g. ".../Q0001.hea"), or None if it isn't packed.
+
+    The packed copy is used unless a loose file with another mtime or size sits next to the
+    pack, so edited files are read, served and re-ingested from disk until pack_dataset
+    appends their new version. Every reader of sample files goes through this lookup.
+    """
+    current = _current_entry(path)
+    return current[1] if current else None
+
+
+def read_packed(path: Path) -> memoryview | None:
+    """Return the packed bytes of a sample file, or None if it isn't packed, see pack_entry."""
+    current = _current_entry(path)
+    return current[0].get(path.name) if current else None
+
+
+def sample_file_exists(path: Path) -> bool:
+    """Whether a sample file exists, either packed or as a loose file."""
+    return pack_entry(path) is not None or path.is_file()
+
+
+def open_sample_file(path: Path) -> BinaryIO:
+    """Open a sample file for binary reading, from its pack if it is packed."""
+    data = read_packed(path)
+    if data is not None:
+        return io.BytesIO(data)
+    return open(path, 'rb')
+
+
+def sample_file_hash(path: Path) -> str:
+    """SHA-256 of a sample file. Packed files are hashed once, when they are packed."""
+    entry = pack_entry(path)
+    if entry:
+        return entry.sha256
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def append_to_pack(ds_dir: Path, files: list[Path]) -> int:
+    """
+    Append loose files of a dataset directory to its pack and return how many were appended.
+
+    The pack is append-only: files whose mtime and size match their packed entry are skipped,
+    changed files are appended again and their index entry points at the new copy. The
+    index is replaced atomically after the pack is flushed, so an interrupted run leaves at
+    most unreferenced bytes at the end of the pack.
+    """
+    pack_path = ds_dir / PACK_NAME
+    index_path = ds_dir / PACK_INDEX_NAME
+    members = {}
+    if index_path.exists():
+        members = {name: PackEntry(*entry) for name, entry in json.loads(index_path.read_bytes())['members'].items()}
+
+    appended = 0
+    with open(pack_path, 'ab') as pack:
+        if pack.tell() == 0:
+            pack.write(PACK_MAGIC)
+        for path in files:
+            stat = path.stat()
+            entry = members.get(path.name)
+            if entry and entry.mtime == stat.st_mtime and entry.length == stat.st_size:
+                continue
+
+            data = path.read_bytes()
+            pack.write(b'\0' * (-pack.tell() % PACK_ALIGNMENT))
+            members[path.name] = PackEntry(pack.tell(), len(data), stat.st_mtime, hashlib.sha256(data).hexdigest())
+            pack.write(data)
+            appended += 1
+
+        pack.flush()
+        os.fsync(pack.fileno())
+
+    index = {'version': PACK_VERSION, 'pack': PACK_NAME, 'members': {name: list(entry) for name, entry in sorted(members.items())}}
+    tmp_path = index_path.with_name(f"{PACK_INDEX_NAME}.tmp")
+    tmp_path.write_text(json.dumps(index, separators=(',', ':')))
+    os.replace(tmp_path, index_path)
+    return appended
@@ -0,0 +1,278 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from .downsample import signal_hash
+from .signal import EcgSignal, load_signal
+
+# Bump when the rendered output changes so stale cache entries are never served
+RENDER_VERSION = 1
+
+# Standard ECG paper: 25 mm/s and 10 mm/mV, 1 mm minor and 5 mm major grid boxes
+PAPER_SPEED = 25.0
+PAPER_GAIN = 10.0
+STRIP_HEIGHT_MM = 30.0
+MARGIN_MM = 5.0
+
+# Standard 3x4 layout of 2.5 s columns, plus a full-length lead II rhythm strip
+LEAD_LAYOUT = (
+    ('I', 'aVR', 'V1', 'V4'),
+    ('II', 'aVL', 'V2', 'V5'),
+    ('III', 'aVF', 'V3', 'V6'),
+)
+RHYTHM_LEAD = 'II'
+RECORD_SECONDS = 10.0
+
+# The cache directory is rescanned at least this often, as other processes write to it too
+RENDER_CACHE_SCAN_INTERVAL = 60
+# Eviction frees this share of the cache, so a full cache isn't rescanned on every write
+RENDER_CACHE_EVICT_TARGET = 0.9
+
+GRID_MINOR_COLOR = (255, 220, 220)
+GRID_MAJOR_COLOR = (240, 150, 150)
+TRACE_COLOR = (0, 0, 0)
+
+
+def _draw_grid(draw, width, height, px_per_mm):
+    for mm in range(int(width / px_per_mm) + 1):
+        if mm % 5:
+            draw.line([(mm * px_per_mm, 0), (mm * px_per_mm, height)], fill=GRID_MINOR_COLOR)
+    for mm in range(int(height / px_per_mm) + 1):
+        if mm % 5:
+            draw.line([(0, mm * px_per_mm), (width, mm * px_per_mm)], fill=GRID_MINOR_COLOR)
+    for mm in range(0, int(width / px_per_mm) + 1, 5):
+        draw.line([(mm * px_per_mm, 0), (mm * px_per_mm, height)], fill=GRID_MAJOR_COLOR)
+    for mm in range(0, int(height / px_per_mm) + 1, 5):
+        draw.line([(0, mm * px_per_mm), (width, mm * px_per_mm)], fill=GRID_MAJOR_COLOR)
+
+
+def _draw_trace(draw, signal, lead, start_s, stop_s, x0, y0, px_per_mm, line_width):
+    """Draw `lead` between `start_s` and `stop_s` seconds with its baseline at (x0, y0)."""
+    if lead not in signal.lead_names:
+        return
+    window = signal.time_slice(start_s, stop_s)
+    values = signal.physical([lead], window.start, window.stop)[0]
+    if not len(values):
+        return
+
+    xs = x0 + np.arange(len(values)) / signal.fs * PAPER_SPEED * px_per_mm
+    ys = y0 - values * PAPER_GAIN * px_per_mm
+    draw.line(list(zip(xs.tolist(), ys.tolist())), fill=TRACE_COLOR, width=line_width, joint='curve')
+
+
+def render_ecg(signal: EcgSignal, width: int | None = None, dpi: int = 100) -> bytes:
+    """
+    Render the standard 12-lead ECG sheet of a signal as PNG bytes.
+
+    The sheet is laid out on 25 mm/s, 10 mm/mV paper. `width` sets the image width in pixels
+    and the paper scale follows from it. Without a width, the scale follows from `dpi`.
+    """
+    paper_width_mm = RECORD_SECONDS * PAPER_SPEED + 2 * MARGIN_MM
+    paper_height_mm = (len(LEAD_LAYOUT) + 1) * STRIP_HEIGHT_MM + 2 * MARGIN_MM
+    px_per_mm = width / paper_width_mm if width else dpi / 25.4
+    image_width = round(paper_width_mm * px_per_mm)
+    image_height = round(paper_height_mm * px_per_mm)
+
+    image = Image.new('RGB', (image_width, image_height), 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=max(8, round(3.5 * px_per_mm)))
+    line_width = max(1, round(px_per_mm / 4))
+    _draw_grid(draw, image_width, image_height, px_per_mm)
+
+    column_seconds = RECORD_SECONDS / len(LEAD_LAYOUT[0])
+    x_margin = MARGIN_MM * px_per_mm
+    for row, leads in enumerate([*LEAD_LAYOUT, (RHYTHM_LEAD,)]):
+        y0 = (MARGIN_MM + (row + 0.5) * STRIP_HEIGHT_MM) * px_per_mm
+        seconds = column_seconds if len(leads) > 1 else RECORD_SECONDS
+        for column, lead in enumerate(leads):
+            start_s = column * seconds
+            x0 = x_margin + start_s * PAPER_SPEED * px_per_mm
+            _draw_trace(draw, signal, lead, start_s, start_s + seconds, x0, y0, px_per_mm, line_width)
+            draw.text((x0 + px_per_mm, y0 - STRIP_HEIGHT_MM * 0.45 * px_per_mm), lead, fill=TRACE_COLOR, font=font)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', dpi=(dpi, dpi), optimize=True)
+    return buffer.getvalue()
+
+
+class RenderCache:
+    """
+    Content-addressed disk cache of rendered images, bounded in total size.
+
+    Entries are keyed by a hash of the signal content and render parameters. A hit refreshes
+    the file's mtime, and when the cache grows past `max_bytes` the least recently used
+    entries are evicted. The directory is only scanned when the size estimated from the last
+    scan and this process' writes reaches `max_bytes`, or when that scan is too old.
+    """
+
+    # cache_dir -> (estimated size in bytes, monotonic time of the last scan), per process
+    _usage: dict[Path, tuple[int, float]] = {}
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(record_path: Path, width: int | None, dpi: int) -> str:
+        return hashlib.sha256(f"{signal_hash(record_path)}:{width}:{dpi}:{RENDER_VERSION}".encode()).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.png"
+
+    def get(self, key: str) -> Path | None:
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> Path:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+        size, scanned_at = self._usage.get(self.cache_dir, (None, 0))
+        if size is None or size + len(data) > self.max_bytes or time.monotonic() - scanned_at > RENDER_CACHE_SCAN_INTERVAL:
+            self.evict()
+        else:
+            self._usage[self.cache_dir] = (size + len(data), scanned_at)
+        return path
+
+    def evict(self):
+        """Delete least recently used entries once the cache exceeds `max_bytes`, down to the eviction target."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob('*/*.png'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * RENDER_CACHE_EVICT_TARGET:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+        self._usage[self.cache_dir] = (total, time.monotonic())
+
+
+def _render_record(record_path: Path, width: int | None, dpi: int) -> bytes:
+    return render_ecg(load_signal(record_path), width, dpi)
+
+
+_executor = None
+
+# Tasks running in the render pool, by (function, args), so concurrent requests for the same
+# output wait on one task instead of each submitting their own
+_pending: dict[tuple, Future] = {}
+_pending_lock = threading.Lock()
+
+
+def get_render_executor(workers: int) -> ProcessPoolExecutor:
+    """Return the process pool used for rendering, creating it on first use."""
+    global _executor
+    if _executor is None:
+        # Spawned workers only import numpy/Pillow and never inherit the caller's DB connections
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _reset_render_executor(executor: ProcessPoolExecutor):
+    global _executor
+    if _executor is executor:
+        _executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_to_render_pool(workers: int, function, *args, on_result: Callable | None = None) -> Future:
+    """
+    Run a function in the render pool unless the same call is already running, returning its future.
+
+    The future's result is the function's result passed through on_result when given. on_result
+    runs as soon as the task finishes, even when nobody waits for it anymore, so e.g. a render
+    that outlived its request is still stored for the next one.
+    """
+    key = (function, args)
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future
+
+        for attempt in range(2):
+            executor = get_render_executor(workers)
+            try:
+                task = executor.submit(function, *args)
+                break
+            except BrokenProcessPool:
+                _reset_render_executor(executor)
+                if attempt:
+                    raise
+        future = _pending[key] = Future()
+
+    def finish(task):
+        with _pending_lock:
+            del _pending[key]
+        try:
+            result = task.result()
+            if on_result is not None:
+                result = on_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    task.add_done_callback(finish)
+    return future
+
+
+def run_in_render_pool(workers: int, timeout: float | None, function, *args, on_result: Callable | None = None):
+    """
+    Run a function in the render pool and return its result, see submit_to_render_pool.
+
+    TimeoutError is raised when it takes longer than timeout, and the task keeps running. A
+    worker killed mid-task (e.g. out of memory) breaks the whole pool, so a broken pool is
+    replaced and the call retried once. BrokenProcessPool is raised if it breaks again.
+    """
+    for attempt in range(2):
+        executor = get_render_executor(workers)
+        try:
+            return submit_to_render_pool(workers, function, *args, on_result=on_result).result(timeout=timeout)
+        except BrokenProcessPool:
+            _reset_render_executor(executor)
+            if attempt:
+                raise
+
+
+def render_cached(cache: RenderCache, record_path: Path, width: int | None = None, dpi: int = 100,
+                  workers: int = 2, timeout: float | None = 10) -> Path:
+    """
+    Return the cached render of a record, rendering it in the process pool on a miss.
+
+    Keep timeout well under the web server's worker timeout: a render that takes longer raises
+    TimeoutError, and is cached once it finishes.
+    """
+    key = cache.key(record_path, width, dpi)
+    path = cache.get(key)
+    if path is None:
+        path = run_in_render_pool(workers, timeout, _render_record, record_path, width, dpi, on_result=partial(cache.put, key))
+    return path
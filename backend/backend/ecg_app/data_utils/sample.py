@@ -1,48 +1,242 @@
+import hashlib
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
 from pathlib import Path
+from typing import NamedTuple
+
+from .pack import open_pack, read_packed
+
+HEADER_SUFFIX = '.hea'
+SIGNAL_SUFFIX = '.mat'
+IMAGE_SUFFIX = '.png'
+_ARTIFACT_FLAGS = {HEADER_SUFFIX: 1, SIGNAL_SUFFIX: 2, IMAGE_SUFFIX: 4}
+
+
+class LeadSpec:
+    """A parsed signal specification line of a WFDB header."""
+    __slots__ = (
+        'file_name', 'fmt', 'byte_offset', 'gain', 'baseline', 'units',
+        'adc_res', 'adc_zero', 'init_value', 'checksum', 'block_size', 'name'
+    )
+
+    def __init__(self, line: str):
+        fields = line.split(maxsplit=8)
+        self.file_name = fields[0]
+
+        # Format field: "<format>[x<samples_per_frame>][:<skew>][+<byte_offset>]"
+        fmt, _, offset = fields[1].partition('+')
+        self.fmt = int(fmt.split('x')[0].split(':')[0])
+        self.byte_offset = int(offset) if offset else 0
+
+        # Gain field: "<gain>[(<baseline>)][/<units>]"
+        gain = fields[2] if len(fields) > 2 else ''
+        gain, _, units = gain.partition('/')
+        gain, _, baseline = gain.partition('(')
+        self.gain = float(gain) if gain and float(gain) != 0 else 200.0
+        self.units = units or 'mV'
+
+        self.adc_res = int(fields[3]) if len(fields) > 3 else 0
+        self.adc_zero = int(fields[4]) if len(fields) > 4 else 0
+        self.baseline = int(baseline.rstrip(')')) if baseline else self.adc_zero
+        self.init_value = int(fields[5]) if len(fields) > 5 else self.adc_zero
+        self.checksum = int(fields[6]) if len(fields) > 6 else None
+        self.block_size = int(fields[7]) if len(fields) > 7 else 0
+        self.name = fields[8] if len(fields) > 8 else ''
+
+    def __repr__(self) -> str:
+        return f"LeadSpec({self.name!r}, gain={self.gain}, baseline={self.baseline}, units={self.units!r})"
 
 
 class SampleHeader:
+    """
+    A parsed WFDB header (.hea) of a sample record.
+
+    The record line and the "#Key: value" comments are parsed once on construction.
+    The per-lead signal lines are only parsed the first time `leads` is accessed.
+    """
+    __slots__ = ('record_name', 'num_leads', 'fs', 'num_samples', 'comments', '_record_line', '_lead_lines', '_leads')
+
     def __init__(self, header_data: list[str]):
-        self.header_data = header_data
+        lines = [line for line in header_data if line]
+        spec_lines = [line for line in lines if not line.startswith('#')]
+
+        self._record_line = spec_lines[0]
+        fields = self._record_line.split()
+        self.record_name = fields[0].split('/')[0]
+        self.num_leads = int(fields[1])
+        self.fs = float(fields[2].split('/')[0].split('(')[0]) if len(fields) > 2 else 250.0
+        self.num_samples = int(fields[3]) if len(fields) > 3 else 0
+
+        self._lead_lines = tuple(spec_lines[1:1 + self.num_leads])
+        self._leads = None
+
+        self.comments = {}
+        for line in lines:
+            if line.startswith('#'):
+                key, _, value = line[1:].partition(':')
+                self.comments[key.strip()] = value.strip()
 
     def __str__(self) -> str:
-        return '\n'.join(self.header_data)
-    
+        comment_lines = [f"#{key}: {value}" for key, value in self.comments.items()]
+        return '\n'.join([self._record_line, *self._lead_lines, *comment_lines])
+
+    def __repr__(self) -> str:
+        return f"SampleHeader({self.record_name!r}, leads={self.num_leads}, fs={self.fs}, samples={self.num_samples})"
+
     def __len__(self) -> int:
-        return int(self.header_data[0].split(' ')[3])
-    
+        return self.num_samples
+
+    @property
+    def leads(self) -> tuple[LeadSpec, ...]:
+        if self._leads is None:
+            self._leads = tuple(LeadSpec(line) for line in self._lead_lines)
+        return self._leads
+
+    @property
+    def lead_names(self) -> list[str]:
+        return [lead.name for lead in self.leads]
+
+    @property
+    def duration(self) -> float:
+        """Record duration in seconds."""
+        return self.num_samples / self.fs
+
     @property
     def age(self) -> int | None:
         try:
-            age = int(self.header_data[13][6:])
+            age = int(self.comments.get('Age', ''))
             return age if age > 0 else None
         except ValueError:
             return None
-    
+
     @property
     def gender(self) -> str | None:
-        gender = self.header_data[14][6:]
+        gender = self.comments.get('Sex')
         return gender if gender in ['Male', 'Female'] else None
-    
+
     @property
     def codes(self) -> list[int]:
-        codes_str = self.header_data[15][5:]
-        return [int(code) for code in codes_str.split(',')]
+        codes_str = self.comments.get('Dx', '')
+        return [int(code) for code in codes_str.split(',') if code.strip().isdigit()]
 
 
 def load_header(path: Path) -> SampleHeader:
-    """Load a header .hea file into a custom SampleHeader object."""
+    """Load a header .hea file, loose or packed, into a custom SampleHeader object."""
     hea_path = path if path.suffix == '.hea' else path.with_suffix('.hea')
+    data = read_packed(hea_path)
+    if data is not None:
+        return SampleHeader([l.strip() for l in bytes(data).decode().splitlines()])
     with open(hea_path, 'r') as f:
         lines = [l.strip() for l in f.readlines()]
     return SampleHeader(lines)
 
 
+def _load_header_pair(path: Path) -> tuple[Path, SampleHeader]:
+    return path, load_header(path)
+
+
+def load_headers_parallel(
+    paths: Iterable[Path],
+    workers: int | None = None,
+    chunksize: int = 64,
+    ordered: bool = True,
+) -> Iterator[tuple[Path, SampleHeader]]:
+    """
+    Parse many header files in a process pool, yielding (path, header) pairs.
+
+    Paths are streamed into the pool in chunks of `chunksize`, so the input may be
+    a lazy iterable. With `ordered=False` results are yielded as soon as any worker
+    finishes a chunk. `workers=1` parses serially in the calling process.
+    """
+    if workers == 1:
+        yield from map(_load_header_pair, paths)
+        return
+
+    with Pool(processes=workers) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(_load_header_pair, paths, chunksize=chunksize)
+
+
+def resolve_sample_path(data_dir: Path, relative_path: str) -> Path | None:
+    """Resolve a client-supplied path inside `data_dir`, or return None if it escapes the directory."""
+    normalized_path = os.path.normpath(relative_path).lstrip('/')
+    root = os.path.abspath(data_dir)
+    full_path = os.path.abspath(os.path.join(root, normalized_path))
+    if os.path.commonpath([root, full_path]) != root:
+        return None
+    return Path(full_path)
+
+
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+class SampleRecord(NamedTuple):
+    """A sample record on disk (path without suffix) and which of its artifacts exist."""
+    path: Path
+    has_header: bool
+    has_signal: bool
+    has_image: bool
+
+
+def _scan_dataset_dir(ds_path: str) -> list[SampleRecord]:
+    """Return the sample records of a dataset directory, loose or packed, sorted by name."""
+    artifacts = {}
+    with os.scandir(ds_path) as entries:
+        for entry in entries:
+            stem, suffix = os.path.splitext(entry.name)
+            flag = _ARTIFACT_FLAGS.get(suffix)
+            if flag and entry.is_file():
+                artifacts[stem] = artifacts.get(stem, 0) | flag
+
+    pack = open_pack(ds_path)
+    for name in pack.members if pack else ():
+        stem, suffix = os.path.splitext(name)
+        flag = _ARTIFACT_FLAGS.get(suffix)
+        if flag:
+            artifacts[stem] = artifacts.get(stem, 0) | flag
+
+    return [
+        SampleRecord(Path(ds_path, stem), bool(flags & 1), bool(flags & 2), bool(flags & 4))
+        for stem, flags in sorted(artifacts.items())
+    ]
+
+
+def iter_sample_records(data_dir: Path, workers: int = 1) -> Iterator[SampleRecord]:
+    """
+    Lazily yield the sample records of every dataset directory in `data_dir`.
+
+    Each dataset directory is scanned once with os.scandir and its .hea/.mat/.png siblings
+    are grouped per record. Files stored in the directory's pack count as present. Records
+    are yielded sorted by name within each dataset directory, and directories in name order.
+
+    With `workers` > 1 that many directories are scanned ahead in threads, which overlaps
+    their I/O on network or spinning storage; otherwise only one directory's record names
+    are held in memory at a time.
+    """
+    with os.scandir(data_dir) as entries:
+        ds_paths = sorted(entry.path for entry in entries if entry.is_dir() and not entry.name.startswith('.'))
+
+    if workers <= 1:
+        for ds_path in ds_paths:
+            yield from _scan_dataset_dir(ds_path)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        scans = deque()
+        for ds_path in ds_paths:
+            scans.append(executor.submit(_scan_dataset_dir, ds_path))
+            if len(scans) > workers:
+                yield from scans.popleft().result()
+        while scans:
+            yield from scans.popleft().result()
+
+
 def get_samples_paths(data_dir: Path) -> list[Path]:
     """Get a list of all sample paths in the specified data directory."""
-    samples_paths = []
-    dirs = [dir for dir in data_dir.iterdir() if dir.is_dir()]
-    for ds_path in dirs:
-        ds_samples_paths = sorted(set([i.with_suffix('') for i in ds_path.iterdir()]))
-        samples_paths += list(ds_samples_paths)
-    return samples_paths
+    return [record.path for record in iter_sample_records(data_dir)]
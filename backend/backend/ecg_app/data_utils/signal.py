@@ -0,0 +1,131 @@
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from .pack import read_packed
+from .sample import SIGNAL_SUFFIX, SampleHeader, load_header
+
+# WFDB storage formats supported by the loader, mapped to their NumPy dtype
+SIGNAL_DTYPES = {16: np.dtype('<i2')}
+
+
+class EcgSignal:
+    """
+    A multi-lead ECG signal backed by a read-only memory map of the record's .mat payload.
+
+    `digital` is a zero-copy (leads, samples) int16 view of the stored data. Physical values
+    (digital - baseline) / gain are only computed for the leads and time window requested.
+    """
+
+    def __init__(self, header: SampleHeader, data: np.ndarray):
+        self.header = header
+        self._data = data  # (samples, leads), the on-disk (column-major .mat) layout
+
+    def __len__(self) -> int:
+        return self._data.shape[0]
+
+    @property
+    def fs(self) -> float:
+        return self.header.fs
+
+    @property
+    def lead_names(self) -> list[str]:
+        return self.header.lead_names
+
+    @property
+    def digital(self) -> np.ndarray:
+        """The raw int16 samples as a (leads, samples) view."""
+        return self._data.T
+
+    def lead_index(self, lead: int | str) -> int:
+        """Return the row of a lead given by index or name (e.g. "II", "V1")."""
+        if isinstance(lead, str):
+            try:
+                return self.lead_names.index(lead)
+            except ValueError:
+                raise KeyError(f"Unknown lead: {lead}") from None
+        if not -self.header.num_leads <= lead < self.header.num_leads:
+            raise IndexError(f"Lead index out of range: {lead}")
+        return lead % self.header.num_leads
+
+    def time_slice(self, start: float | None = None, stop: float | None = None) -> slice:
+        """Convert a time window in seconds into a slice of sample indices, clamped to the record."""
+        start_idx = None if start is None else self._sample_index(start)
+        stop_idx = None if stop is None else self._sample_index(stop)
+        return slice(start_idx, stop_idx)
+
+    def _sample_index(self, seconds: float) -> int:
+        # Clamped in seconds first, so huge times don't overflow and negative ones don't count from the end
+        duration = len(self) / self.fs
+        return min(len(self), int(round(min(max(seconds, 0.0), duration) * self.fs)))
+
+    def window(self, leads=None, start: int | None = None, stop: int | None = None) -> np.ndarray:
+        """
+        Return the raw samples of the selected leads between sample indices `start` and `stop`.
+
+        Without `leads` the result is a view of the memory map; selecting leads copies only
+        the requested window.
+        """
+        data = self.digital[:, start:stop]
+        if leads is None:
+            return data
+        return data[[self.lead_index(lead) for lead in leads]]
+
+    def physical(self, leads=None, start: int | None = None, stop: int | None = None, dtype=np.float32) -> np.ndarray:
+        """Return the selected window converted to physical units (usually mV)."""
+        return self.to_physical(self.window(leads, start, stop), leads, dtype)
+
+    def to_physical(self, samples: np.ndarray, leads=None, dtype=np.float32) -> np.ndarray:
+        """Convert raw (leads, n) samples of the given leads, e.g. a downsampled window, to physical units."""
+        specs = self.header.leads
+        rows = range(self.header.num_leads) if leads is None else [self.lead_index(lead) for lead in leads]
+        gain = np.array([specs[row].gain for row in rows], dtype=dtype)[:, None]
+        baseline = np.array([specs[row].baseline for row in rows], dtype=dtype)[:, None]
+        return (samples.astype(dtype) - baseline) / gain
+
+
+def load_signal(path: Path, header: SampleHeader | None = None) -> EcgSignal:
+    """
+    Memory-map the .mat signal of a sample record without reading it into memory.
+
+    Packed signals are viewed in place in the memory-mapped dataset pack.
+    """
+    header = header or load_header(path)
+    mat_path = path.with_suffix(SIGNAL_SUFFIX)
+    spec = header.leads[0]
+
+    dtype = SIGNAL_DTYPES.get(spec.fmt)
+    if dtype is None:
+        raise ValueError(f"Unsupported signal format {spec.fmt} in {mat_path}")
+
+    shape = (header.num_samples, header.num_leads)
+    expected_size = spec.byte_offset + dtype.itemsize * shape[0] * shape[1]
+    packed = read_packed(mat_path)
+    size = len(packed) if packed is not None else mat_path.stat().st_size
+    if size < expected_size:
+        raise ValueError(f"Signal file {mat_path} is smaller than its header describes")
+
+    if packed is not None:
+        data = np.frombuffer(packed, dtype=dtype, count=shape[0] * shape[1], offset=spec.byte_offset).reshape(shape)
+    else:
+        data = np.memmap(mat_path, dtype=dtype, mode='r', offset=spec.byte_offset, shape=shape)
+    return EcgSignal(header, data)
+
+
+def pack_waveform(metadata: dict, arrays: dict[str, np.ndarray]) -> bytes:
+    """
+    Pack arrays into the binary waveform payload served by the waveform API.
+
+    Layout: a little-endian uint32 with the length of a UTF-8 JSON metadata header, the
+    header itself, then each array's raw little-endian C-order bytes back to back. The
+    header's "arrays" entry lists the name, dtype and shape of each array in payload order.
+    """
+    arrays = {name: np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<')) for name, array in arrays.items()}
+    header = dict(metadata, arrays=[
+        {'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        for name, array in arrays.items()
+    ])
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    return b''.join([struct.pack('<I', len(header_bytes)), header_bytes, *(array.tobytes() for array in arrays.values())])
@@ -0,0 +1,242 @@
+import io
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
+from multiprocessing import Pool
+from pathlib import Path
+
+from PIL import Image
+
+from .render import RENDER_VERSION, render_ecg
+from .pack import open_sample_file, pack_entry, sample_file_exists, sample_file_hash
+from .sample import IMAGE_SUFFIX, SIGNAL_SUFFIX
+from .signal import load_signal
+
+TILE_SIZE = 256
+TILE_OVERLAP = 1
+# ECG sheets are line art, which lossless WebP compresses better than lossy WebP or PNG
+TILE_FORMATS = {'webp': {'lossless': True, 'method': 4}, 'png': {'optimize': True}}
+TILE_CONTENT_TYPES = {'webp': 'image/webp', 'png': 'image/png'}
+TILE_PACK_SUFFIX = '.tiles'
+
+# Resolution of sheets rendered from the signal when a record has no PNG
+TILE_RENDER_DPI = 300
+
+# Pack layout: MAGIC, tile bytes back to back, a UTF-8 JSON index, then the footer
+# (uint64 index offset, uint32 index length, MAGIC)
+PACK_MAGIC = b'ECGDZI01'
+PACK_FOOTER = struct.Struct('<QI8s')
+
+
+def level_sizes(width: int, height: int) -> list[tuple[int, int]]:
+    """Image size of each pyramid level, from the 1x1 level 0 up to the full-size image."""
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    return [
+        (math.ceil(width / 2 ** (max_level - level)), math.ceil(height / 2 ** (max_level - level)))
+        for level in range(max_level + 1)
+    ]
+
+
+def _tile_box(col: int, row: int, width: int, height: int, tile_size: int, overlap: int) -> tuple[int, int, int, int]:
+    left = col * tile_size - (overlap if col else 0)
+    top = row * tile_size - (overlap if row else 0)
+    right = min(width, (col + 1) * tile_size + overlap)
+    bottom = min(height, (row + 1) * tile_size + overlap)
+    return left, top, right, bottom
+
+
+def iter_tiles(image: Image.Image, tile_size: int = TILE_SIZE, overlap: int = TILE_OVERLAP) -> Iterator[tuple[int, int, int, Image.Image]]:
+    """
+    Cut an image into a Deep Zoom pyramid, yielding (level, col, row, tile) from the full-size level down.
+
+    Each level halves the one above it, so the whole pyramid costs about 4/3 of the
+    full-size level to produce.
+    """
+    sizes = level_sizes(*image.size)
+    level_image = image
+    for level in reversed(range(len(sizes))):
+        width, height = sizes[level]
+        if level_image.size != (width, height):
+            level_image = level_image.resize((width, height), Image.Resampling.LANCZOS)
+        for row in range(math.ceil(height / tile_size)):
+            for col in range(math.ceil(width / tile_size)):
+                yield level, col, row, level_image.crop(_tile_box(col, row, width, height, tile_size, overlap))
+
+
+def write_tile_pack(image: Image.Image, path: Path, fmt: str = 'webp', source_hash: str | None = None,
+                    tile_size: int = TILE_SIZE, overlap: int = TILE_OVERLAP) -> int:
+    """
+    Write the tile pyramid of an image as a single pack file and return its size in bytes.
+
+    The index stores, per level, the column/row counts and the offset and length of every
+    tile in row-major order, so a tile is one slice of the memory-mapped pack.
+    """
+    sizes = level_sizes(*image.size)
+    levels = [
+        {'cols': math.ceil(width / tile_size), 'rows': math.ceil(height / tile_size), 'offsets': [], 'lengths': []}
+        for width, height in sizes
+    ]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(PACK_MAGIC)
+        for level, _, _, tile in iter_tiles(image, tile_size, overlap):
+            buffer = io.BytesIO()
+            tile.save(buffer, format=fmt.upper(), **TILE_FORMATS[fmt])
+            levels[level]['offsets'].append(f.tell())
+            levels[level]['lengths'].append(buffer.tell())
+            f.write(buffer.getbuffer())
+
+        index = {
+            'width': image.width,
+            'height': image.height,
+            'tile_size': tile_size,
+            'overlap': overlap,
+            'format': fmt,
+            'source_hash': source_hash,
+            'levels': levels,
+        }
+        index_bytes = json.dumps(index, separators=(',', ':')).encode()
+        index_offset = f.tell()
+        f.write(index_bytes)
+        f.write(PACK_FOOTER.pack(index_offset, len(index_bytes), PACK_MAGIC))
+        size = f.tell()
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+    return size
+
+
+class TilePack:
+    """Read-only, memory-mapped view of a tile pack written by `write_tile_pack`."""
+
+    def __init__(self, path: Path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < len(PACK_MAGIC) + PACK_FOOTER.size or self._mmap[:len(PACK_MAGIC)] != PACK_MAGIC:
+            raise ValueError(f"Not a tile pack: {path}")
+        index_offset, index_length, magic = PACK_FOOTER.unpack_from(self._mmap, len(self._mmap) - PACK_FOOTER.size)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"Truncated tile pack: {path}")
+
+        self.index = json.loads(self._mmap[index_offset:index_offset + index_length])
+        self.levels = self.index['levels']
+
+    @property
+    def format(self) -> str:
+        return self.index['format']
+
+    @property
+    def source_hash(self) -> str | None:
+        return self.index['source_hash']
+
+    def tile(self, level: int, col: int, row: int) -> bytes | None:
+        """Return the encoded bytes of a tile, or None if it is outside the pyramid."""
+        if not 0 <= level < len(self.levels):
+            return None
+        entry = self.levels[level]
+        if not (0 <= col < entry['cols'] and 0 <= row < entry['rows']):
+            return None
+        i = row * entry['cols'] + col
+        offset = entry['offsets'][i]
+        return self._mmap[offset:offset + entry['lengths'][i]]
+
+    def dzi(self) -> str:
+        """Deep Zoom Image descriptor of the pyramid, as expected by viewers such as OpenSeadragon."""
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+            f'Format="{self.format}" Overlap="{self.index["overlap"]}" TileSize="{self.index["tile_size"]}">'
+            f'<Size Width="{self.index["width"]}" Height="{self.index["height"]}"/>'
+            '</Image>'
+        )
+
+
+@lru_cache(maxsize=64)
+def _open_tile_pack(path: str, mtime_ns: int, size: int) -> TilePack:
+    return TilePack(Path(path))
+
+
+def open_tile_pack(path: Path) -> TilePack | None:
+    """Return the pack at `path`, memoized per (path, mtime, size), or None if it doesn't exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return _open_tile_pack(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def tile_pack_path(tiles_dir: Path, source_path: str) -> Path:
+    """Location of the pack of a dataset-relative record path."""
+    return Path(tiles_dir) / f"{source_path}{TILE_PACK_SUFFIX}"
+
+
+def tile_source_hash(record_path: Path) -> str:
+    """Hash of what the pyramid of a record is cut from: its PNG, or else its rendered signal."""
+    image_path = record_path.with_suffix(IMAGE_SUFFIX)
+    if sample_file_exists(image_path):
+        return f"image:{sample_file_hash(image_path)}"
+    return f"render{RENDER_VERSION}:{sample_file_hash(record_path.with_suffix(SIGNAL_SUFFIX))}"
+
+
+def tile_source_mtime(record_path: Path) -> float | None:
+    """Modification time of what the pyramid of a record is cut from, or None if the record has neither."""
+    for path in (record_path.with_suffix(IMAGE_SUFFIX), record_path.with_suffix(SIGNAL_SUFFIX)):
+        entry = pack_entry(path)
+        if entry:
+            return entry.mtime
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def load_tile_source(record_path: Path) -> Image.Image:
+    """Open the image of a record, rendering it from the signal when the record has no PNG."""
+    image_path = record_path.with_suffix(IMAGE_SUFFIX)
+    if sample_file_exists(image_path):
+        with Image.open(open_sample_file(image_path)) as image:
+            return image.convert('RGB')
+    return Image.open(io.BytesIO(render_ecg(load_signal(record_path), dpi=TILE_RENDER_DPI))).convert('RGB')
+
+
+def build_tile_pack(record_path: Path, pack_path: Path, fmt: str = 'webp', force: bool = False) -> bool:
+    """
+    Build the pack of a record unless an up-to-date one exists. Returns True if it was (re)built.
+
+    A pack is up to date when it was cut from the same source content in the same format.
+    """
+    source_hash = tile_source_hash(record_path)
+    if not force:
+        try:
+            pack = open_tile_pack(pack_path)
+        except ValueError:
+            pack = None
+        if pack is not None and pack.source_hash == source_hash and pack.format == fmt:
+            return False
+
+    write_tile_pack(load_tile_source(record_path), pack_path, fmt, source_hash)
+    return True
+
+
+def _run_build(args: tuple[Path, Path, str, bool]) -> bool:
+    return build_tile_pack(*args)
+
+
+def build_tile_packs_parallel(jobs: Iterable[tuple[Path, Path]], fmt: str = 'webp', force: bool = False,
+                              workers: int | None = None) -> Iterator[bool]:
+    """Build the packs of many (record path, pack path) pairs in a process pool, yielding whether each was rebuilt."""
+    tasks = ((record_path, pack_path, fmt, force) for record_path, pack_path in jobs)
+    if workers == 1:
+        yield from map(_run_build, tasks)
+        return
+
+    with Pool(processes=workers) as pool:
+        yield from pool.imap_unordered(_run_build, tasks, chunksize=2)
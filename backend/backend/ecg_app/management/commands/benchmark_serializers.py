@@ -0,0 +1,164 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from ecg_app.models import EcgDocLabels, EcgSamples, EcgSampleValidation, Profile, ValidationHistory
+from ecg_app.renderers import ORJSONRenderer
+from ecg_app.serializers import ProfileSerializer
+from ecg_app.values_serializers import (
+    PendingSampleValuesSerializer, ProfileValuesSerializer, ValidatedSampleValuesSerializer,
+)
+
+SEED_PREFIX = '__serializer_benchmark_'
+
+def _doc_label(label):
+    return {'label_id': label.label_id, 'label_desc': label.label_desc} if label else None
+
+
+def previous_pending_samples(queryset):
+    """The rows pending_samples built before the values serializers, one query per relation and row."""
+    return [
+        {
+            'id': validation.id,
+            'sample_id': validation.sample.sample_id,
+            'path': validation.sample.sample_path,
+            'prev_tag': _doc_label(validation.prev_tag),
+            'new_tag': _doc_label(validation.new_tag),
+        }
+        for validation in queryset
+    ]
+
+
+def previous_validated_samples(queryset):
+    """The rows validated_samples built before the values serializers, one query per relation and row."""
+    return [
+        {
+            **row,
+            'history': [
+                {
+                    'validated_by': hist.validated_by.username,
+                    'prev_tag': _doc_label(hist.prev_tag),
+                    'new_tag': _doc_label(hist.new_tag),
+                    'comment': hist.comment,
+                    'created_at': hist.created_at,
+                }
+                for hist in validation.history.all().order_by('-created_at')
+            ],
+        }
+        for validation, row in zip(queryset, previous_pending_samples(queryset))
+    ]
+
+
+# (description, previous implementation, values serializer), both given the seeded rows only.
+# Profiles were serialized by ProfileSerializer, the samples by hand-built dicts in the views.
+BENCHMARKS = [
+    (
+        "Profiles",
+        lambda: ProfileSerializer(Profile.objects.filter(user__username__startswith=SEED_PREFIX).select_related('user'), many=True).data,
+        lambda: ProfileValuesSerializer(Profile.objects.filter(user__username__startswith=SEED_PREFIX)).data,
+    ),
+    (
+        "Pending samples",
+        lambda: previous_pending_samples(
+            EcgSampleValidation.objects.filter(sample__sample_path__startswith=SEED_PREFIX, have_been_validated=False)
+        ),
+        lambda: PendingSampleValuesSerializer(
+            EcgSampleValidation.objects.filter(sample__sample_path__startswith=SEED_PREFIX, have_been_validated=False)
+        ).data,
+    ),
+    (
+        "Validated samples",
+        lambda: previous_validated_samples(
+            EcgSampleValidation.objects.filter(sample__sample_path__startswith=SEED_PREFIX, have_been_validated=True)
+        ),
+        lambda: ValidatedSampleValuesSerializer(
+            EcgSampleValidation.objects.filter(sample__sample_path__startswith=SEED_PREFIX, have_been_validated=True)
+        ).data,
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare the previous serialization of large lists and the stock JSON renderer to the values serializers and orjson renderer on seeded rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Number of rows in each response")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs of each step, the fastest is reported")
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            self.seed(kwargs['rows'])
+
+            self.stdout.write(f"{'':<20}{'serialize':>22}{'render':>22}{'total':>22}{'speedup':>10}")
+            for description, previous_data, values_data in BENCHMARKS:
+                serialize_time, data = self.measure(previous_data, kwargs['repeat'])
+                render_time, content = self.measure(lambda: JSONRenderer().render(data), kwargs['repeat'])
+                values_time, fast_data = self.measure(values_data, kwargs['repeat'])
+                orjson_time, _ = self.measure(lambda: ORJSONRenderer().render(fast_data), kwargs['repeat'])
+
+                before, after = serialize_time + render_time, values_time + orjson_time
+                self.stdout.write(
+                    f"{description:<20}"
+                    f"{self.pair(serialize_time, values_time):>22}"
+                    f"{self.pair(render_time, orjson_time):>22}"
+                    f"{self.pair(before, after):>22}"
+                    f"{before / after:>9.1f}x"
+                )
+                if kwargs['verbosity'] > 1:
+                    self.stdout.write(f"    {len(fast_data)} rows, {len(content)} bytes")
+
+            # Nothing seeded is kept
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("[+] Times are in ms, previous implementation + JSONRenderer -> values serializer + orjson"))
+
+    @staticmethod
+    def measure(function, repeat):
+        """Fastest run time of a function in ms, with its result."""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    @staticmethod
+    def pair(before, after):
+        return f"{before:.0f} -> {after:.0f}"
+
+    def seed(self, rows):
+        """Bulk-create the users, profiles, samples, validations and history the benchmarks read."""
+        rng = random.Random(0)
+
+        labels = EcgDocLabels.objects.bulk_create([EcgDocLabels(label_desc=f"{SEED_PREFIX}{i}") for i in range(10)])
+        users = User.objects.bulk_create([
+            User(username=f"{SEED_PREFIX}{i}", email=f"{SEED_PREFIX}{i}@example.org", first_name='First', last_name='Last', password='!')
+            for i in range(rows)
+        ], batch_size=5000)
+        Profile.objects.bulk_create([
+            Profile(user=user, role=rng.choice(('student', 'teacher')), gender=rng.choice(('Male', 'Female', None)))
+            for user in users
+        ], batch_size=5000)
+
+        # One response of pending samples and one of validated samples, with a history entry each by one of a few teachers
+        teachers = users[:50]
+        samples = EcgSamples.objects.bulk_create([EcgSamples(sample_path=f"{SEED_PREFIX}/{i}") for i in range(2 * rows)], batch_size=5000)
+        validations = EcgSampleValidation.objects.bulk_create([
+            EcgSampleValidation(
+                sample=sample, have_been_validated=i >= rows,
+                prev_tag=rng.choice(labels), new_tag=rng.choice(labels) if i >= rows else None,
+            )
+            for i, sample in enumerate(samples)
+        ], batch_size=5000)
+        ValidationHistory.objects.bulk_create([
+            ValidationHistory(
+                validation=validation, validated_by=rng.choice(teachers), sample=validation.sample,
+                prev_tag=validation.prev_tag, new_tag=validation.new_tag, comment='',
+            )
+            for validation in validations[rows:]
+        ], batch_size=5000)
@@ -0,0 +1,50 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from ecg_app.data_utils.sample import iter_sample_records
+from ecg_app.data_utils.tiles import TILE_FORMATS, build_tile_packs_parallel, tile_pack_path
+
+
+class Command(BaseCommand):
+    help = "Cut the ECG sample images (or renders of their signal) into packed Deep Zoom tile pyramids"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples_dir', type=str, help="Path to the directory containing sample paths")
+        parser.add_argument('--format', type=str, default='webp', choices=sorted(TILE_FORMATS), help="Tile image format")
+        parser.add_argument('--workers', type=int, default=None, help="Tiling processes (default: CPU count, 1 to run serially)")
+        parser.add_argument('--force', action='store_true', help="Rebuild pyramids of unchanged samples")
+
+    def handle(self, *args, **kwargs):
+        samples_dir = kwargs['samples_dir']
+        if not samples_dir:
+            self.stderr.write("[!] --samples_dir is required.")
+            return
+
+        samples_dir = Path(samples_dir).resolve()
+        dataset_root = Path(settings.DATASET_SAMPLES_PATH).resolve()
+        if not samples_dir.is_relative_to(dataset_root):
+            self.stderr.write(self.style.ERROR(f"[!] {samples_dir} is not inside DATASET_SAMPLES_PATH ({dataset_root})"))
+            return
+
+        jobs = (
+            (record.path, tile_pack_path(settings.TILES_DIR, os.path.relpath(record.path, dataset_root)))
+            for record in iter_sample_records(samples_dir)
+            if record.has_image or record.has_header and record.has_signal
+        )
+
+        built_count = 0
+        skipped_count = 0
+        results = build_tile_packs_parallel(jobs, kwargs['format'], kwargs['force'], kwargs['workers'])
+        for built in tqdm(results, desc='Building Tiles', unit='Sample', ncols=120, leave=False):
+            if built:
+                built_count += 1
+            else:
+                skipped_count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"[+] Built tile pyramids for {built_count} samples ({skipped_count} unchanged) from directory: {samples_dir}"
+        ))
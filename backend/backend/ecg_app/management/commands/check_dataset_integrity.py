@@ -0,0 +1,110 @@
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from tqdm import tqdm
+
+from ecg_app.models import EcgSamples
+from ecg_app.data_utils.integrity import check_signals_parallel
+from ecg_app.data_utils.sample import HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX, iter_sample_records
+
+
+class Command(BaseCommand):
+    help = "Check that every sample has valid .hea, .mat and .png files, and every sample file has a sample row"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples_dir', type=str, help="Path to the directory containing sample paths")
+        parser.add_argument('--workers', type=int, default=None, help="Checksum validation processes and directory scan threads (default: CPU count, 1 to run serially)")
+        parser.add_argument('--report', type=str, default=None, help="Write the JSON report to this file instead of stdout")
+        parser.add_argument('--skip_checksums', action='store_true', help="Only check that files and rows match, without reading signals")
+
+    def handle(self, *args, **kwargs):
+        samples_dir = kwargs['samples_dir']
+        if not samples_dir:
+            self.stderr.write("[!] --samples_dir is required.")
+            return
+
+        # Sample paths are stored as found under --samples_dir by populate_ecg_data, so it isn't resolved
+        samples_dir = Path(samples_dir)
+        rows = dict(
+            EcgSamples.objects.filter(sample_path__startswith=f"{samples_dir}/").values_list('sample_path', 'sample_id')
+        )
+
+        problems = {'incomplete_records': [], 'orphaned_records': [], 'dangling_rows': []}
+        counts = {'records': 0, 'signals': 0}
+        records = iter_sample_records(samples_dir, workers=kwargs['workers'] or os.cpu_count())
+        signal_paths = self.cross_check(records, rows, problems, counts)
+
+        # Signals are checked as the cross-check finds them, the pool pulls their paths from it lazily
+        checksum_errors = []
+        if kwargs['skip_checksums']:
+            for _ in signal_paths:
+                pass
+        else:
+            results = check_signals_parallel(signal_paths, workers=kwargs['workers'])
+            for record_path, errors in tqdm(results, desc='Checking Signals', unit='Sample', ncols=120, leave=False):
+                if errors:
+                    checksum_errors.append({'record': str(record_path), 'errors': errors})
+            checksum_errors.sort(key=lambda entry: entry['record'])
+
+        report = {
+            'samples_dir': str(samples_dir),
+            'checked_at': datetime.now(timezone.utc).isoformat(),
+            'summary': {
+                'records': counts['records'],
+                'signals_checked': 0 if kwargs['skip_checksums'] else counts['signals'],
+                'invalid_signals': len(checksum_errors),
+                **{key: len(entries) for key, entries in problems.items()},
+            },
+            'invalid_signals': checksum_errors,
+            **problems,
+        }
+        self.write_report(report, kwargs['report'])
+
+        problem_count = sum(count for key, count in report['summary'].items() if key not in ('records', 'signals_checked'))
+        if problem_count:
+            raise CommandError(f"[!] Found {problem_count} integrity problems in {samples_dir}")
+        self.stderr.write(self.style.SUCCESS(f"[+] Checked {counts['records']} records in {samples_dir}, no problems found"))
+
+    @staticmethod
+    def cross_check(records, rows, problems, counts):
+        """
+        Match the records found on disk with the sample rows, yielding the records whose signal can be checked.
+
+        Problems are added to the lists of `problems` and consumed rows are popped from `rows`,
+        so the rows left once the generator is exhausted have no file at all.
+        """
+        for record in records:
+            counts['records'] += 1
+            sample_id = rows.pop(str(record.path), None)
+            missing = [
+                suffix for suffix, present in
+                ((HEADER_SUFFIX, record.has_header), (SIGNAL_SUFFIX, record.has_signal), (IMAGE_SUFFIX, record.has_image))
+                if not present
+            ]
+            if sample_id is None:
+                problems['orphaned_records'].append(str(record.path))
+            if missing and sample_id is None:
+                problems['incomplete_records'].append({'record': str(record.path), 'missing': missing})
+            elif missing:
+                problems['dangling_rows'].append({'sample_id': sample_id, 'record': str(record.path), 'missing': missing})
+            if record.has_header and record.has_signal:
+                counts['signals'] += 1
+                yield record.path
+
+        # Rows whose record has no file at all
+        problems['dangling_rows'] += [
+            {'sample_id': sample_id, 'record': sample_path, 'missing': [HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX]}
+            for sample_path, sample_id in rows.items()
+        ]
+
+    def write_report(self, report, report_path):
+        """Write the report as JSON, to a file or to stdout so it can be piped."""
+        if report_path:
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stderr.write(f"[+] Report written to {report_path}")
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,173 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ecg_app.partitions import PARTITIONED_MODELS, add_months, create_partition, is_partitioned, list_partitions, month_start
+from ecg_app.models import (
+    EcgDocLabels, EcgSamples, EcgSampleValidation, Group, GroupMembership,
+    Question, QuestionAttempt, Quiz, QuizAttempt,
+)
+
+SEED_PREFIX = '__plan_check_'
+
+# (description, index expected in the plan, queryset factory taking the seeded rows)
+PLAN_CHECKS = [
+    (
+        "Most recent quiz attempts of a user",
+        'quizattempt_user_started_idx',
+        lambda seed: QuizAttempt.objects.filter(user=seed['user']).order_by('-started_at')[:10],
+    ),
+    (
+        "Quiz attempts of a user since a date",
+        'quizattempt_user_started_idx',
+        lambda seed: QuizAttempt.objects.filter(user=seed['user'], started_at__gte=timezone.now() - timedelta(days=30)).values('id'),
+    ),
+    (
+        "Completed quiz attempts of a user",
+        'quizattempt_user_completed_idx',
+        lambda seed: QuizAttempt.objects.filter(user=seed['user'], completed_at__isnull=False).values('id'),
+    ),
+    (
+        "Correct answers of a quiz attempt",
+        'questionattempt_correct_idx',
+        lambda seed: QuestionAttempt.objects.filter(quiz_attempt=seed['quiz_attempt'], is_correct=True).values('id'),
+    ),
+    (
+        "Pending membership requests of a group",
+        'groupmembership_status_idx',
+        lambda seed: GroupMembership.objects.filter(group=seed['group'], status='pending'),
+    ),
+    (
+        "Pending sample validations",
+        'validation_pending_idx',
+        lambda seed: EcgSampleValidation.objects.filter(have_been_validated=False),
+    ),
+]
+
+# Indexes that serve a check equally well once its table is partitioned by month. Partition pruning
+# already narrows quiz attempts by date, and within a month the user alone is selective, so the
+# planner picks either composite index starting with the user.
+PARTITIONED_ALTERNATIVES = {
+    'quizattempt_user_started_idx': ['quizattempt_user_completed_idx'],
+    'quizattempt_user_completed_idx': ['quizattempt_user_started_idx'],
+}
+
+
+class Command(BaseCommand):
+    help = "Seed realistic volumes in a rolled-back transaction and check with EXPLAIN that hot queries use their indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help="Number of users to seed")
+        parser.add_argument('--attempts', type=int, default=10, help="Quiz attempts per user")
+        parser.add_argument('--samples', type=int, default=10000, help="Number of ECG samples, each with a validation")
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f"[!] Query plans can only be checked on PostgreSQL or SQLite, not {connection.vendor}")
+
+        failures = []
+        with transaction.atomic():
+            seed = self.seed(kwargs['users'], kwargs['attempts'], kwargs['samples'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            for description, index_name, make_queryset in PLAN_CHECKS:
+                plan = make_queryset(seed).explain()
+                if kwargs['verbosity'] > 1:
+                    self.stdout.write(f"{description}:\n{plan}\n")
+                if any(name in plan for name in self.index_names(index_name)):
+                    self.stdout.write(self.style.SUCCESS(f"[+] {description}: uses {index_name}"))
+                else:
+                    failures.append(description)
+                    self.stderr.write(self.style.ERROR(f"[!] {description}: does not use {index_name}\n{plan}"))
+
+            # Nothing seeded is kept
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"[!] {len(failures)} of {len(PLAN_CHECKS)} queries don't use their index")
+
+    def index_names(self, index_name):
+        """The index and, on partitioned PostgreSQL tables, the per-partition indexes attached to it or its alternatives."""
+        if connection.vendor != 'postgresql':
+            return [index_name]
+        with connection.cursor() as cursor:
+            names = [index_name]
+            for name in [index_name] + PARTITIONED_ALTERNATIVES.get(index_name, []):
+                cursor.execute(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+                    [name]
+                )
+                partition_indexes = [partition_index for (partition_index,) in cursor.fetchall()]
+                if partition_indexes and name != index_name:
+                    names.append(name)
+                names += partition_indexes
+            return names
+
+    def seed(self, user_count, attempts_per_user, sample_count):
+        """Bulk-create users, quizzes, attempts, groups and validations, returning rows to query for."""
+        rng = random.Random(0)
+        now = timezone.now()
+        self.create_month_partitions(add_months(month_start(now), -12), month_start(now))
+
+        labels = EcgDocLabels.objects.bulk_create([EcgDocLabels(label_desc=f"{SEED_PREFIX}{i}") for i in range(10)])
+        samples = EcgSamples.objects.bulk_create([EcgSamples(sample_path=f"{SEED_PREFIX}/{i}") for i in range(sample_count)])
+        # Most samples have been validated, only a few are pending
+        EcgSampleValidation.objects.bulk_create([
+            EcgSampleValidation(sample=sample, have_been_validated=rng.random() > 0.02) for sample in samples
+        ], batch_size=5000)
+
+        users = User.objects.bulk_create([User(username=f"{SEED_PREFIX}{i}", password='!') for i in range(user_count)], batch_size=5000)
+        quizzes = Quiz.objects.bulk_create([Quiz(title=f"{SEED_PREFIX}{i}") for i in range(50)])
+        questions = Question.objects.bulk_create([
+            Question(quiz=quiz, ecg_sample=rng.choice(samples), correct_label=rng.choice(labels), question_text='')
+            for quiz in quizzes for _ in range(10)
+        ])
+        questions_by_quiz = {}
+        for question in questions:
+            questions_by_quiz.setdefault(question.quiz_id, []).append(question)
+
+        # started_at is auto_now_add, so attempts are spread over the last year after they're created
+        quiz_attempts = QuizAttempt.objects.bulk_create([
+            QuizAttempt(user=user, quiz=rng.choice(quizzes)) for user in users for _ in range(attempts_per_user)
+        ], batch_size=5000)
+        for attempt in quiz_attempts:
+            attempt.started_at = now - timedelta(days=rng.uniform(0, 365))
+            attempt.completed_at = attempt.started_at + timedelta(minutes=10) if rng.random() > 0.1 else None
+        QuizAttempt.objects.bulk_update(quiz_attempts, ['started_at', 'completed_at'], batch_size=5000)
+
+        QuestionAttempt.objects.bulk_create([
+            QuestionAttempt(
+                quiz_attempt=attempt, question=question, is_correct=rng.random() > 0.4,
+                correct_label_id=question.correct_label_id, created_at=attempt.started_at,
+            )
+            for attempt in quiz_attempts for question in questions_by_quiz[attempt.quiz_id]
+        ], batch_size=5000)
+
+        groups = Group.objects.bulk_create([Group(name=f"{SEED_PREFIX}{i}", teacher=users[i]) for i in range(max(1, user_count // 10))])
+        GroupMembership.objects.bulk_create([
+            GroupMembership(group=group, student=user, status=rng.choice(('pending', 'approved', 'approved', 'rejected')))
+            for user in users for group in rng.sample(groups, min(5, len(groups)))
+        ], batch_size=5000)
+
+        return {'user': users[0], 'quiz_attempt': quiz_attempts[0], 'group': groups[0]}
+
+    def create_month_partitions(self, first, last):
+        """On partitioned PostgreSQL tables, give the seeded months their partitions instead of the default one."""
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            for model, column in PARTITIONED_MODELS:
+                table = model._meta.db_table
+                if not is_partitioned(cursor, table):
+                    continue
+                existing = list_partitions(cursor, table)
+                month = first
+                while month <= last:
+                    if month not in existing:
+                        create_partition(cursor, table, column, month)
+                    month = add_months(month, 1)
@@ -2,6 +2,7 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from ecg_app.models import Quiz, Question, Choice, EcgSamples, EcgDocLabels, EcgSamplesDocLabels
+from ecg_app.catalog import get_doc_labels
 import random
 
 
@@ -34,7 +35,7 @@ class Command(BaseCommand):
             num_questions = sample_count
 
         # Get all doc labels for creating distractors
-        all_doc_labels = list(EcgDocLabels.objects.all())
+        all_doc_labels = get_doc_labels()
         if len(all_doc_labels) < choices_per_question:
             self.stderr.write(self.style.ERROR(
                 f'Not enough doc labels available. Need at least {choices_per_question} labels.'
@@ -65,6 +66,7 @@ class Command(BaseCommand):
                     question = Question.objects.create(
                         quiz=quiz,
                         ecg_sample=sample,
+                        correct_label=correct_label,
                         question_text=f"What is the correct diagnosis for this ECG?"
                     )
 
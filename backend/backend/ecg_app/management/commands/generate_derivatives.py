@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from ecg_app.models import EcgImageDerivative
+from ecg_app.data_utils.derivatives import DerivativeJob, generate_derivatives_parallel
+from ecg_app.data_utils.sample import IMAGE_SUFFIX, iter_sample_records
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail, medium and lossless WebP derivatives of the ECG sample images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples_dir', type=str, help="Path to the directory containing sample paths")
+        parser.add_argument('--workers', type=int, default=None, help="Image processing processes (default: CPU count, 1 to run serially)")
+        parser.add_argument('--batch_size', type=int, default=500, help="Number of derivative rows written per bulk insert")
+        parser.add_argument('--force', action='store_true', help="Regenerate derivatives of unchanged images")
+
+    def handle(self, *args, **kwargs):
+        samples_dir = kwargs['samples_dir']
+        if not samples_dir:
+            self.stderr.write("[!] --samples_dir is required.")
+            return
+
+        samples_dir = Path(samples_dir).resolve()
+        dataset_root = Path(settings.DATASET_SAMPLES_PATH).resolve()
+        if not samples_dir.is_relative_to(dataset_root):
+            self.stderr.write(self.style.ERROR(f"[!] {samples_dir} is not inside DATASET_SAMPLES_PATH ({dataset_root})"))
+            return
+
+        known_hashes = {} if kwargs['force'] else dict(
+            EcgImageDerivative.objects.values_list('source_path', 'source_hash').distinct()
+        )
+        jobs = (
+            DerivativeJob(
+                record.path.with_suffix(IMAGE_SUFFIX),
+                os.path.relpath(record.path, dataset_root),
+                known_hashes.get(os.path.relpath(record.path, dataset_root))
+            )
+            for record in iter_sample_records(samples_dir)
+            if record.has_image
+        )
+
+        generated_count = 0
+        skipped_count = 0
+        batch = []
+        results = generate_derivatives_parallel(jobs, Path(settings.DERIVATIVES_DIR), kwargs['workers'])
+        for derivatives in tqdm(results, desc='Generating Derivatives', unit='Image', ncols=120, leave=False):
+            if not derivatives:
+                skipped_count += 1
+                continue
+            generated_count += 1
+            batch += [EcgImageDerivative(**derivative._asdict()) for derivative in derivatives]
+            if len(batch) >= kwargs['batch_size']:
+                self.save_derivatives(batch)
+                batch = []
+        self.save_derivatives(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"[+] Generated derivatives for {generated_count} images ({skipped_count} unchanged) from directory: {samples_dir}"
+        ))
+
+    @staticmethod
+    def save_derivatives(derivatives):
+        """Insert derivative rows, replacing the rows of regenerated images."""
+        EcgImageDerivative.objects.bulk_create(
+            derivatives,
+            update_conflicts=True,
+            unique_fields=['source_path', 'variant', 'format'],
+            update_fields=['path', 'width', 'height', 'size_bytes', 'source_hash', 'created_at']
+        )
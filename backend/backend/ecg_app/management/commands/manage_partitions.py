@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ecg_app.partitions import (
+    PARTITIONED_MODELS, add_months, create_partition, detach_partition, is_partitioned, list_partitions, month_start,
+)
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions of the attempt tables and detach partitions past the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months_ahead', type=int, default=3, help="Number of future months to have partitions for")
+        parser.add_argument('--retain_months', type=int, default=None, help="Detach partitions older than this many months (default: keep all)")
+        parser.add_argument('--archive_schema', type=str, default='archive', help="Schema detached partitions are moved to")
+        parser.add_argument('--drop', action='store_true', help="Drop detached partitions instead of archiving them")
+        parser.add_argument('--dry_run', action='store_true', help="Only print what would be done")
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != 'postgresql':
+            raise CommandError(f"[!] Partitioning requires PostgreSQL, not {connection.vendor}")
+
+        this_month = month_start(timezone.now())
+        wanted = [add_months(this_month, offset) for offset in range(kwargs['months_ahead'] + 1)]
+        cutoff = add_months(this_month, -kwargs['retain_months']) if kwargs['retain_months'] is not None else None
+        archive_schema = None if kwargs['drop'] else kwargs['archive_schema']
+
+        created = {}
+        partitions = {}
+        for model, column in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            # Each table's partitions are created in their own transaction, so a failure leaves the other one consistent
+            with transaction.atomic(), connection.cursor() as cursor:
+                if not is_partitioned(cursor, table):
+                    raise CommandError(f"[!] {table} is not partitioned, run the migrations first")
+                partitions[table] = list_partitions(cursor, table)
+
+                created[table] = [month for month in wanted if month not in partitions[table]]
+                for month in created[table]:
+                    if kwargs['dry_run']:
+                        self.stdout.write(f"Would create {table} partition for {month:%Y-%m}")
+                        continue
+                    moved = create_partition(cursor, table, column, month)
+                    if moved:
+                        self.stdout.write(f"[+] Moved {moved} rows of {month:%Y-%m} from the default partition of {table}")
+
+        # A quiz attempt and its question attempts share a month (see partitions.py), so a month is detached
+        # from every table at once and a failure leaves all of them attached
+        expired = sorted({month for table_partitions in partitions.values() for month in table_partitions if cutoff and month < cutoff})
+        with transaction.atomic(), connection.cursor() as cursor:
+            for month in expired:
+                for table, table_partitions in partitions.items():
+                    if month not in table_partitions:
+                        continue
+                    if kwargs['dry_run']:
+                        self.stdout.write(f"Would detach {table_partitions[month]}")
+                        continue
+                    detach_partition(cursor, table, table_partitions[month], archive_schema)
+
+        if not kwargs['dry_run']:
+            for table, table_partitions in partitions.items():
+                detached_count = sum(month in table_partitions for month in expired)
+                detached = f"archived {detached_count} to schema {archive_schema}" if archive_schema else f"dropped {detached_count}"
+                self.stdout.write(self.style.SUCCESS(
+                    f"[+] {table}: created {len(created[table])} partitions, {detached}, "
+                    f"{len(table_partitions) + len(created[table]) - detached_count} attached"
+                ))
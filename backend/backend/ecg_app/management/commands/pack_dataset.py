@@ -0,0 +1,60 @@
+import hashlib
+import os
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from ecg_app.data_utils.pack import PackReader, PACK_INDEX_NAME, append_to_pack
+from ecg_app.data_utils.sample import HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX
+
+
+class Command(BaseCommand):
+    help = "Pack the .hea, .mat and .png files of each dataset directory into one append-only pack file with an offset index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples_dir', type=str, help="Path to the directory containing the dataset directories")
+        parser.add_argument('--delete_loose', action='store_true', help="Delete loose files once their packed copy is verified")
+
+    def handle(self, *args, **kwargs):
+        samples_dir = kwargs['samples_dir']
+        if not samples_dir:
+            self.stderr.write("[!] --samples_dir is required.")
+            return
+
+        samples_dir = Path(samples_dir)
+        with os.scandir(samples_dir) as entries:
+            ds_paths = sorted(Path(entry.path) for entry in entries if entry.is_dir() and not entry.name.startswith('.'))
+
+        appended_count = 0
+        deleted_count = 0
+        for ds_path in tqdm(ds_paths, desc='Packing Datasets', unit='Dataset', ncols=120, leave=False):
+            with os.scandir(ds_path) as entries:
+                files = sorted(
+                    Path(entry.path) for entry in entries
+                    if entry.is_file() and os.path.splitext(entry.name)[1] in (HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX)
+                )
+            if not files:
+                continue
+
+            appended_count += append_to_pack(ds_path, files)
+            if kwargs['delete_loose']:
+                deleted_count += self.delete_loose_files(ds_path, files)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"[+] Packed {appended_count} new or changed files from {len(ds_paths)} dataset directories in: {samples_dir}"
+            + (f" ({deleted_count} loose files deleted)" if kwargs['delete_loose'] else "")
+        ))
+
+    def delete_loose_files(self, ds_path, files):
+        """Delete the loose files whose packed copy has the same content."""
+        reader = PackReader(ds_path / PACK_INDEX_NAME)
+        deleted = 0
+        for path in files:
+            packed = reader.get(path.name)
+            if packed is None or hashlib.sha256(packed).hexdigest() != reader.members[path.name].sha256:
+                self.stderr.write(self.style.ERROR(f"[!] Packed copy of {path} does not match, keeping the loose file"))
+                continue
+            path.unlink()
+            deleted += 1
+        return deleted
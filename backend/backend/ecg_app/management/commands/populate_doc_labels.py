@@ -11,6 +11,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--labels_file', type=str, help="Path to the doc_labels.txt file")
         parser.add_argument('--samples_csv', type=str, help="Path to the sample_name_to_doc_label_balanced_400.csv file")
+        parser.add_argument('--batch_size', type=int, default=1000, help="Number of relationships inserted per bulk insert")
 
     def handle(self, *args, **kwargs):
         labels_file = kwargs['labels_file']
@@ -21,47 +22,52 @@ class Command(BaseCommand):
             return
 
         self.populate_doc_labels(labels_file)
-        self.populate_sample_relationships(samples_csv)
+        self.populate_sample_relationships(samples_csv, kwargs['batch_size'])
 
     def populate_doc_labels(self, labels_file_path):
         """Populate the EcgDocLabels table from the provided text file."""
         try:
+            existing_labels = set(EcgDocLabels.objects.values_list('label_desc', flat=True))
             with open(labels_file_path, 'r') as file:
-                labels = [line.strip() for line in file if line.strip()]
+                labels = dict.fromkeys(line.strip() for line in file if line.strip())
 
-            for label in labels:
-                EcgDocLabels.objects.get_or_create(label_desc=label)
+            new_labels = [label for label in labels if label not in existing_labels]
+            EcgDocLabels.objects.bulk_create([EcgDocLabels(label_desc=label) for label in new_labels], ignore_conflicts=True)
 
-            self.stdout.write(self.style.SUCCESS(f"[+] Populated EcgDocLabels table with data from {labels_file_path}"))
+            self.stdout.write(self.style.SUCCESS(
+                f"[+] Populated EcgDocLabels table with data from {labels_file_path} "
+                f"({len(new_labels)} new, {len(labels) - len(new_labels)} existing)"
+            ))
 
         except FileNotFoundError:
             self.stderr.write(self.style.ERROR(f"[!] File not found: {labels_file_path}"))
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"[!] Error: {str(e)}"))
 
-    def populate_sample_relationships(self, samples_csv_path):
-        """Populate the EcgSamplesDocLabels table from the provided CSV file."""
+    def populate_sample_relationships(self, samples_csv_path, batch_size=1000):
+        """Populate the EcgSamplesDocLabels table with the relationships of the CSV file that don't exist yet."""
         try:
-            # Create a dictionary of sample names to EcgSamples objects
-            samples_dict = {
-                sample.sample_path.split('/')[-1]: sample 
-                for sample in EcgSamples.objects.all()
+            # Map sample names (the last component of the sample path) and label descriptions to ids
+            sample_ids = {
+                sample_path.split('/')[-1]: sample_id
+                for sample_id, sample_path in EcgSamples.objects.values_list('sample_id', 'sample_path')
             }
+            label_ids = dict(EcgDocLabels.objects.values_list('label_desc', 'label_id'))
 
-            # Create a dictionary of label descriptions to EcgDocLabels objects
-            labels_dict = {
-                label.label_desc: label 
-                for label in EcgDocLabels.objects.all()
-            }
+            # Each sample has at most one doc label
+            existing = dict(EcgSamplesDocLabels.objects.values_list('sample_id', 'label_id'))
 
             with open(samples_csv_path, 'r') as file:
                 csv_reader = csv.reader(file)
                 next(csv_reader)  # Skip header row if exists
-                
-                success_count = 0
+
+                created_count = 0
+                existing_count = 0
+                conflict_count = 0
                 error_count = 0
                 missing_samples = set()
                 missing_labels = set()
+                batch = []
 
                 for row in csv_reader:
                     if len(row) < 2:
@@ -74,27 +80,35 @@ class Command(BaseCommand):
 
                     sample_name = row[0].strip()
                     doc_label = row[1].replace('"', '').strip()
-                    
-                    # Get the corresponding sample and label objects
-                    sample = samples_dict.get(sample_name)
-                    label = labels_dict.get(doc_label)
-                    
-                    if sample and label:
-                        try:
-                            EcgSamplesDocLabels.objects.get_or_create(
-                                sample_id=sample,
-                                label_id=label
-                            )
-                            success_count += 1
-                        except Exception as e:
-                            self.stderr.write(self.style.ERROR(f'[!] Error creating relationship for {sample_name}: {str(e)}'))
-                            error_count += 1
-                    else:
+
+                    sample_id = sample_ids.get(sample_name)
+                    label_id = label_ids.get(doc_label)
+                    if sample_id is None or label_id is None:
                         error_count += 1
-                        if not sample:
+                        if sample_id is None:
                             missing_samples.add(sample_name)
-                        if not label:
+                        if label_id is None:
                             missing_labels.add(doc_label)
+                        continue
+
+                    current_label_id = existing.get(sample_id)
+                    if current_label_id == label_id:
+                        existing_count += 1
+                        continue
+                    if current_label_id is not None:
+                        # The sample is already labeled differently, the existing label is kept
+                        conflict_count += 1
+                        continue
+
+                    existing[sample_id] = label_id
+                    batch.append(EcgSamplesDocLabels(sample_id_id=sample_id, label_id_id=label_id))
+                    if len(batch) >= batch_size:
+                        EcgSamplesDocLabels.objects.bulk_create(batch, ignore_conflicts=True)
+                        created_count += len(batch)
+                        batch = []
+
+                EcgSamplesDocLabels.objects.bulk_create(batch, ignore_conflicts=True)
+                created_count += len(batch)
 
                 # Report missing samples
                 display_missing_samples = False  # set to True for debugging
@@ -121,9 +135,12 @@ class Command(BaseCommand):
                     else:
                         self.stderr.write(self.style.WARNING(f"[!] Missing {len(missing_labels)} labels"))
 
+                if conflict_count:
+                    self.stderr.write(self.style.WARNING(f"[!] Kept the existing label of {conflict_count} samples labeled differently in the CSV"))
+
             self.stdout.write(self.style.SUCCESS(
-                f"[+] Successfully populated {success_count} relationships. "
-                f"Failed to create {error_count} relationships."
+                f"[+] Successfully populated {created_count} new relationships ({existing_count} existing). "
+                f"Failed to create {error_count + conflict_count} relationships."
             ))
 
         except FileNotFoundError:
@@ -1,11 +1,14 @@
 import csv
+import hashlib
 from pathlib import Path
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from tqdm import tqdm
 
-from ecg_app.models import EcgSamples, EcgSnomed, EcgSamplesSnomed
-from ecg_app.data_utils.sample import load_header, get_samples_paths
+from ecg_app.models import EcgSamples, EcgSnomed, EcgSamplesSnomed, EcgIngestionManifest
+from ecg_app.data_utils.pack import pack_entry
+from ecg_app.data_utils.sample import load_headers_parallel, iter_sample_records, hash_file
 
 
 class Command(BaseCommand):
@@ -14,6 +17,9 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--snomed_csv', type=str, help="Path to the SNOMED CSV file")
         parser.add_argument('--samples_dir', type=str, help="Path to the directory containing sample paths")
+        parser.add_argument('--workers', type=int, default=None, help="Header parsing processes (default: CPU count, 1 to parse serially)")
+        parser.add_argument('--batch_size', type=int, default=1000, help="Number of samples inserted per bulk insert")
+        parser.add_argument('--force', action='store_true', help="Re-ingest every sample, ignoring the ingestion manifest")
 
     def handle(self, *args, **kwargs):
         snomed_csv = kwargs['snomed_csv']
@@ -24,37 +30,158 @@ class Command(BaseCommand):
             return
 
         self.populate_snomed(snomed_csv)
-        self.populate_samples_and_relationships(samples_dir)
+        self.populate_samples_and_relationships(samples_dir, kwargs['workers'], kwargs['batch_size'], kwargs['force'])
 
     def populate_snomed(self, snomed_csv_path):
-        """Populate the EcgSnomed table from the provided CSV file."""
+        """Populate the EcgSnomed table with the codes of the provided CSV file that don't exist yet."""
+        existing = dict(EcgSnomed.objects.values_list('label_code', 'label_desc'))
+        existing_descs = set(existing.values())
+        new_labels = []
+        existing_count = 0
+        conflict_count = 0
         with open(snomed_csv_path, 'r') as csvfile:
             reader = csv.DictReader(csvfile)
             for row in reader:
                 label_code = int(row['code'])
                 label_desc = row['desc']
-                EcgSnomed.objects.get_or_create(label_code=label_code, label_desc=label_desc)
+                if existing.get(label_code) == label_desc:
+                    existing_count += 1
+                elif label_code in existing or label_desc in existing_descs:
+                    # Codes and descriptions are both unique, an existing label with either is kept
+                    conflict_count += 1
+                else:
+                    existing[label_code] = label_desc
+                    existing_descs.add(label_desc)
+                    new_labels.append(EcgSnomed(label_code=label_code, label_desc=label_desc))
 
-        self.stdout.write(self.style.SUCCESS(f"[+] Populated EcgSnomed table with data from {snomed_csv_path}"))
+        EcgSnomed.objects.bulk_create(new_labels, ignore_conflicts=True)
+        if conflict_count:
+            self.stderr.write(self.style.WARNING(f"[!] Skipped {conflict_count} SNOMED rows conflicting with an existing code or description"))
+        self.stdout.write(self.style.SUCCESS(
+            f"[+] Populated EcgSnomed table with data from {snomed_csv_path} ({len(new_labels)} new, {existing_count} existing)"
+        ))
 
-    def populate_samples_and_relationships(self, samples_dir_path):
-        """Populate the EcgSamples and EcgSamplesSnomed tables."""
-        
-        paths = get_samples_paths(Path(samples_dir_path))
-        for sample_path in tqdm(paths, desc='Populating Samples', unit='Sample', ncols=120, leave=False):
-            header = load_header(sample_path)
+    def populate_samples_and_relationships(self, samples_dir_path, workers=None, batch_size=1000, force=False):
+        """Populate the EcgSamples and EcgSamplesSnomed tables with new or changed samples."""
+        samples_dir = Path(samples_dir_path)
+        snomed_ids = dict(EcgSnomed.objects.values_list('label_code', 'label_id'))
+        catalog_hash = hashlib.sha256(','.join(map(str, sorted(snomed_ids))).encode()).hexdigest()
+        records = (record for record in iter_sample_records(samples_dir) if record.has_header)
+        paths, manifest_entries, removed_entries, unchanged_count = self.diff_manifest(samples_dir, records, catalog_hash, force)
 
-            # Create or get the EcgSamples entry
-            ecg_sample, _ = EcgSamples.objects.get_or_create(sample_path=str(sample_path), gender=header.gender, age=header.age)
+        existing_ids = dict(EcgSamples.objects.values_list('sample_path', 'sample_id'))
 
-            # Get SNOMED codes for this sample path
-            for code in header.codes:
-                try:
-                    snomed_label = EcgSnomed.objects.get(label_code=code)
-                except EcgSnomed.DoesNotExist:
-                    continue
+        created_count = 0
+        updated_count = 0
+        batch = []
+        headers = load_headers_parallel(paths, workers=workers)
+        with transaction.atomic():
+            for sample_path, header in tqdm(headers, total=len(paths), desc='Populating Samples', unit='Sample', ncols=120, leave=False):
+                sample = EcgSamples(
+                    sample_id=existing_ids.get(str(sample_path)),
+                    sample_path=str(sample_path),
+                    gender=header.gender,
+                    age=header.age
+                )
+                batch.append((sample, header.codes))
+                if len(batch) >= batch_size:
+                    created, updated = self._bulk_ingest_samples(batch, snomed_ids)
+                    created_count += created
+                    updated_count += updated
+                    batch = []
+            if batch:
+                created, updated = self._bulk_ingest_samples(batch, snomed_ids)
+                created_count += created
+                updated_count += updated
 
-                # Create the relationship in EcgSamplesSnomed
-                EcgSamplesSnomed.objects.get_or_create(sample_id=ecg_sample, label_id=snomed_label)
+            self.save_manifest(manifest_entries, removed_entries)
 
-        self.stdout.write(self.style.SUCCESS(f"[+] Populated EcgSamples and EcgSamplesSnomed tables from directory: {samples_dir_path}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"[+] Populated EcgSamples and EcgSamplesSnomed tables from directory: {samples_dir_path} "
+            f"({created_count} new, {updated_count} changed, {unchanged_count} unchanged, "
+            f"{len(removed_entries)} removed from manifest)"
+        ))
+
+    def diff_manifest(self, samples_dir, records, catalog_hash, force=False):
+        """
+        Compare the files of sample records (.hea, .mat and .png) against the ingestion manifest.
+
+        Samples whose files' newest mtime and total size match the manifest are skipped without
+        being read. The files of other samples are hashed, and only the samples whose content
+        actually changed are returned for ingestion. Packed files are compared using the mtime,
+        size and hash in their pack entry. Samples linked with a different set of SNOMED codes
+        (catalog_hash) are always returned, so codes added to the CSV get linked to them.
+
+        Returns the sample paths to ingest, the manifest entries to save, the manifest entries
+        whose files no longer exist and the number of unchanged samples.
+        """
+        manifest_entries = EcgIngestionManifest.objects.filter(path__startswith=f"{samples_dir}/")
+        manifest = {entry.path: entry for entry in manifest_entries}
+        paths = []
+        entries = []
+        unchanged_count = 0
+
+        for record in records:
+            suffixes = ['.hea'] + ['.mat'] * record.has_signal + ['.png'] * record.has_image
+            files = [(path, pack_entry(path)) for path in map(record.path.with_suffix, suffixes)]
+            stats = [(packed.mtime, packed.length) if packed else self._stat(path) for path, packed in files]
+            mtime, size = max(mtime for mtime, _ in stats), sum(size for _, size in stats)
+
+            hea_path = files[0][0]
+            entry = manifest.pop(str(hea_path), None)
+            if not force and entry and entry.mtime == mtime and entry.size == size and entry.catalog_hash == catalog_hash:
+                unchanged_count += 1
+                continue
+
+            content_hash = hashlib.sha256(''.join(
+                packed.sha256 if packed else hash_file(path) for path, packed in files
+            ).encode()).hexdigest()
+            if entry is None:
+                entry = EcgIngestionManifest(path=str(hea_path))
+            if force or entry.content_hash != content_hash or entry.catalog_hash != catalog_hash:
+                paths.append(record.path)
+            else:
+                unchanged_count += 1
+
+            entry.mtime = mtime
+            entry.size = size
+            entry.content_hash = content_hash
+            entry.catalog_hash = catalog_hash
+            entries.append(entry)
+
+        return paths, entries, list(manifest.values()), unchanged_count
+
+    @staticmethod
+    def _stat(path):
+        stat = path.stat()
+        return stat.st_mtime, stat.st_size
+
+    @staticmethod
+    def save_manifest(entries, removed_entries):
+        """Store the fingerprints of the ingested files and drop entries of deleted files."""
+        EcgIngestionManifest.objects.bulk_create([entry for entry in entries if entry.pk is None])
+        EcgIngestionManifest.objects.bulk_update(
+            [entry for entry in entries if entry.pk is not None],
+            ['mtime', 'size', 'content_hash', 'catalog_hash']
+        )
+        EcgIngestionManifest.objects.filter(pk__in=[entry.pk for entry in removed_entries]).delete()
+
+    @staticmethod
+    def _bulk_ingest_samples(batch, snomed_ids):
+        """Insert or update a batch of (EcgSamples, codes) pairs and their SNOMED relationships."""
+        new_samples = [sample for sample, _ in batch if sample.sample_id is None]
+        changed_samples = [sample for sample, _ in batch if sample.sample_id is not None]
+
+        EcgSamples.objects.bulk_create(new_samples)
+        EcgSamples.objects.bulk_update(changed_samples, ['gender', 'age'])
+        EcgSamplesSnomed.objects.filter(sample_id__in=changed_samples).delete()
+
+        # Codes without a matching EcgSnomed row are skipped, duplicates are collapsed
+        relationships = [
+            EcgSamplesSnomed(sample_id=sample, label_id_id=snomed_ids[code])
+            for sample, codes in batch
+            for code in dict.fromkeys(codes)
+            if code in snomed_ids
+        ]
+        EcgSamplesSnomed.objects.bulk_create(relationships)
+        return len(new_samples), len(changed_samples)
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecg_app', '0010_alter_ecgsamplevalidation_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EcgIngestionManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('mtime', models.FloatField()),
+                ('size', models.BigIntegerField()),
+                ('content_hash', models.CharField(max_length=64)),
+                ('ingested_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
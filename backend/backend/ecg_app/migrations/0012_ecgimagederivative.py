@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecg_app', '0011_ecgingestionmanifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EcgImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_path', models.CharField(max_length=255)),
+                ('variant', models.CharField(choices=[('thumb', 'Thumbnail'), ('medium', 'Medium'), ('full', 'Full size')], max_length=10)),
+                ('format', models.CharField(choices=[('avif', 'AVIF'), ('webp', 'WebP'), ('png', 'PNG')], max_length=10)),
+                ('path', models.CharField(max_length=255)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('size_bytes', models.PositiveIntegerField()),
+                ('source_hash', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('source_path', 'variant', 'format')},
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_correct_labels(apps, schema_editor):
+    """
+    Set the correct label of existing questions from the text of their correct choice, falling
+    back to the sample's current doc label, then copy it onto their attempts.
+    """
+    EcgDocLabels = apps.get_model('ecg_app', 'EcgDocLabels')
+    EcgSamplesDocLabels = apps.get_model('ecg_app', 'EcgSamplesDocLabels')
+    Choice = apps.get_model('ecg_app', 'Choice')
+    Question = apps.get_model('ecg_app', 'Question')
+    QuestionAttempt = apps.get_model('ecg_app', 'QuestionAttempt')
+
+    label_ids = dict(EcgDocLabels.objects.values_list('label_desc', 'label_id'))
+    sample_label_ids = dict(EcgSamplesDocLabels.objects.values_list('sample_id', 'label_id'))
+    correct_texts = dict(Choice.objects.filter(is_correct=True).values_list('question_id', 'text'))
+
+    questions = []
+    for question_id, sample_id in Question.objects.values_list('id', 'ecg_sample_id').iterator():
+        label_id = label_ids.get(correct_texts.get(question_id)) or sample_label_ids.get(sample_id)
+        if label_id is not None:
+            questions.append(Question(id=question_id, correct_label_id=label_id))
+    Question.objects.bulk_update(questions, ['correct_label'], batch_size=1000)
+
+    QuestionAttempt.objects.update(correct_label_id=Subquery(
+        Question.objects.filter(pk=OuterRef('question_id')).values('correct_label_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecg_app', '0012_ecgimagederivative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='correct_label',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='questions', to='ecg_app.ecgdoclabels'),
+        ),
+        migrations.AddField(
+            model_name='questionattempt',
+            name='correct_label',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='question_attempts', to='ecg_app.ecgdoclabels'),
+        ),
+        migrations.RunPython(backfill_correct_labels, migrations.RunPython.noop),
+    ]
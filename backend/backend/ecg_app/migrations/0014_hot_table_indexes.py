@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecg_app', '0013_question_correct_label'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ecgsamplevalidation',
+            index=models.Index(condition=models.Q(('have_been_validated', False)), fields=['sample'], name='validation_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupmembership',
+            index=models.Index(fields=['group', 'status'], name='groupmembership_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='questionattempt',
+            index=models.Index(fields=['quiz_attempt', 'is_correct'], name='questionattempt_correct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'started_at'], name='quizattempt_user_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'completed_at'], name='quizattempt_user_completed_idx'),
+        ),
+    ]
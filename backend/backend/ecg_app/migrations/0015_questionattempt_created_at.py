@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_created_at(apps, schema_editor):
+    """Date existing question attempts at the start of their quiz attempt."""
+    QuizAttempt = apps.get_model('ecg_app', 'QuizAttempt')
+    QuestionAttempt = apps.get_model('ecg_app', 'QuestionAttempt')
+
+    QuestionAttempt.objects.update(created_at=Subquery(
+        QuizAttempt.objects.filter(pk=OuterRef('quiz_attempt_id')).values('started_at')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecg_app', '0014_hot_table_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionattempt',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='questionattempt',
+            name='quiz_attempt',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='question_attempts', to='ecg_app.quizattempt'),
+        ),
+    ]
@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+# (table, partition key column), partitioned by UTC month on PostgreSQL
+PARTITIONED_TABLES = [
+    ('ecg_app_quizattempt', 'started_at'),
+    ('ecg_app_questionattempt', 'created_at'),
+]
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, months):
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + year, month=month_index + 1)
+
+
+def _rebuild_table(cursor, table, column, partitioned):
+    """
+    Rebuild a table as a monthly partitioned table, or back as a plain table, keeping its rows, ids,
+    indexes and foreign keys.
+
+    The rows are copied, so this holds an exclusive lock on the table for the whole copy.
+    """
+    old = f"{table}_unpartitioned" if partitioned else f"{table}_partitioned"
+
+    # New ids continue after both the existing rows and the current sequence
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM "{table}"')
+    next_id = cursor.fetchone()[0]
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    if sequence:
+        cursor.execute(f"SELECT last_value + 1 FROM {sequence}")
+        next_id = max(next_id, cursor.fetchone()[0])
+
+    # Index and constraint definitions still name the table, so they can be replayed on the new one
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [table])
+    primary_key = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s",
+        [table, primary_key]
+    )
+    indexes = cursor.fetchall()
+    cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [table])
+    foreign_keys = cursor.fetchall()
+
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+    cursor.execute(f'ALTER TABLE "{old}" DROP CONSTRAINT "{primary_key}"')
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX "{name}"')
+
+    cursor.execute(
+        f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        + (f' PARTITION BY RANGE ("{column}")' if partitioned else '')
+    )
+    # A serial default would still point at the old table's sequence
+    cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id DROP DEFAULT')
+
+    if partitioned:
+        cursor.execute(f'SELECT MIN("{column}") FROM "{old}"')
+        first = cursor.fetchone()[0] or datetime.now(timezone.utc)
+        now = datetime.now(timezone.utc)
+        month = datetime(first.year, first.month, 1, tzinfo=timezone.utc)
+        last = _add_months(datetime(now.year, now.month, 1, tzinfo=timezone.utc), MONTHS_AHEAD)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE "{table}_p{month:%Y_%m}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)',
+                [month, _add_months(month, 1)]
+            )
+            month = _add_months(month, 1)
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+    cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+    cursor.execute(f'DROP TABLE "{old}"')
+
+    # The partition key has to be part of the primary key of a partitioned table
+    key_columns = f'id, "{column}"' if partitioned else 'id'
+    cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{primary_key}" PRIMARY KEY ({key_columns})')
+    for _, definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+
+    if partitioned:
+        # Partitioned tables can't have identity columns before PostgreSQL 17, an owned sequence works everywhere
+        cursor.execute(f'CREATE SEQUENCE "{table}_id_seq" START WITH {next_id} OWNED BY "{table}".id')
+        cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{table}_id_seq"\')')
+    else:
+        cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {next_id})')
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, column in PARTITIONED_TABLES:
+            _rebuild_table(cursor, table, column, partitioned=True)
+
+
+def unpartition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, column in PARTITIONED_TABLES:
+            _rebuild_table(cursor, table, column, partitioned=False)
+
+
+class Migration(migrations.Migration):
+    """
+    Partition the attempt tables by month on PostgreSQL; other databases keep plain tables.
+
+    Runs separately from 0015 so the backfill's row updates are committed before the tables are rebuilt.
+    """
+
+    dependencies = [
+        ('ecg_app', '0015_questionattempt_created_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
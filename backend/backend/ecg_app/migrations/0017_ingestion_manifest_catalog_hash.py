@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecg_app', '0016_partition_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ecgingestionmanifest',
+            name='catalog_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from simple_history.models import HistoricalRecords
 
+from .versions import VersionedQuerySet
+
 # ---------------------------------------- [ECG Data Models] ----------------------------------------
 
 
@@ -16,6 +18,7 @@ class EcgSamples(models.Model):
     )
     age = models.PositiveIntegerField(blank=True, null=True)
 
+    objects = VersionedQuerySet.as_manager()
 
     def __str__(self):
         return f"Sample {self.sample_id}"
@@ -25,6 +28,8 @@ class EcgDocLabels(models.Model):
     label_id = models.AutoField(primary_key=True)
     label_desc = models.CharField(max_length=255, unique=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     def __str__(self):
         return self.label_desc
 
@@ -34,14 +39,65 @@ class EcgSnomed(models.Model):
     label_code = models.IntegerField(unique=True)
     label_desc = models.CharField(max_length=255, unique=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     def __str__(self):
         return self.label_desc
 
 
+class EcgIngestionManifest(models.Model):
+    """Fingerprint of an ingested sample's files, used to skip unchanged samples on re-ingestion."""
+    path = models.CharField(max_length=255, unique=True)
+    # Newest mtime and total size of the sample's .hea, .mat and .png files, and the hash of their hashes
+    mtime = models.FloatField()
+    size = models.BigIntegerField()
+    content_hash = models.CharField(max_length=64)
+    # Hash of the SNOMED codes known when the sample was linked to them
+    catalog_hash = models.CharField(max_length=64, default='')
+    ingested_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.path
+
+
+class EcgImageDerivative(models.Model):
+    """A resized or re-encoded variant of an ECG sample image, generated by generate_derivatives."""
+    VARIANT_CHOICES = [
+        ('thumb', 'Thumbnail'),
+        ('medium', 'Medium'),
+        ('full', 'Full size'),
+    ]
+    FORMAT_CHOICES = [
+        ('avif', 'AVIF'),
+        ('webp', 'WebP'),
+        ('png', 'PNG'),
+    ]
+
+    source_path = models.CharField(max_length=255)  # Image path relative to DATASET_SAMPLES_PATH, without extension
+    variant = models.CharField(max_length=10, choices=VARIANT_CHOICES)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    path = models.CharField(max_length=255)  # Relative to DERIVATIVES_DIR
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size_bytes = models.PositiveIntegerField()
+    source_hash = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now=True)
+
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('source_path', 'variant', 'format')
+
+    def __str__(self):
+        return f"{self.source_path} ({self.variant}, {self.format})"
+
+
 class EcgSamplesDocLabels(models.Model):
     sample_id = models.ForeignKey(EcgSamples, on_delete=models.CASCADE, related_name='doc_labels')
     label_id = models.ForeignKey(EcgDocLabels, on_delete=models.CASCADE, related_name='samples')
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         unique_together = ('sample_id',)
 
@@ -65,9 +121,15 @@ class EcgSampleValidation(models.Model):
     prev_tag = models.ForeignKey(EcgDocLabels, on_delete=models.CASCADE, related_name='prev_tag', blank=True, null=True)
     new_tag = models.ForeignKey(EcgDocLabels, on_delete=models.CASCADE, related_name='new_tag', blank=True, null=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         unique_together = ('sample',)
         ordering = ['sample']
+        indexes = [
+            # Only a few samples are pending at any time, so only those are indexed, in the default ordering
+            models.Index(fields=['sample'], condition=models.Q(have_been_validated=False), name='validation_pending_idx'),
+        ]
 
     def __str__(self):
         return f"Validation for Sample {self.sample.sample_id}"
@@ -83,6 +145,8 @@ class ValidationHistory(models.Model):
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
 
@@ -135,6 +199,8 @@ class Quiz(models.Model):
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     def __str__(self):
         return self.title
     
@@ -143,6 +209,8 @@ class Question(models.Model):
     """Represents a multi-choice question in a quiz."""
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='questions')
     ecg_sample = models.ForeignKey(EcgSamples, on_delete=models.CASCADE)  # ECG sample to classify
+    # Label of the correct choice when the question was created, kept even if the sample is relabeled
+    correct_label = models.ForeignKey(EcgDocLabels, on_delete=models.SET_NULL, blank=True, null=True, related_name='questions')
     question_text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -162,25 +230,56 @@ class Choice(models.Model):
 
 class QuizAttempt(models.Model):
     """Tracks a user's attempt at a quiz."""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts')
+    # Indexed by the composite indexes below, which start with the user
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts', db_index=False)
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts')
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(blank=True, null=True)
 
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Statistics filter and order a user's attempts by start, personalization by completion
+            models.Index(fields=['user', 'started_at'], name='quizattempt_user_started_idx'),
+            models.Index(fields=['user', 'completed_at'], name='quizattempt_user_completed_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s Attempt on {self.quiz.title}"
     
 
 class QuestionAttempt(models.Model):
     """Tracks a user's answer to a specific question in a quiz attempt."""
-    quiz_attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='question_attempts')
+    # On PostgreSQL quiz attempts are partitioned by month, and a partitioned table's ids can't be referenced
+    # by a database constraint, so the cascade is done by Django only. Indexed by questionattempt_correct_idx.
+    quiz_attempt = models.ForeignKey(
+        QuizAttempt, on_delete=models.CASCADE, related_name='question_attempts', db_constraint=False, db_index=False
+    )
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     selected_choice = models.ForeignKey(Choice, on_delete=models.SET_NULL, blank=True, null=True)
     is_correct = models.BooleanField(default=False)
+    # Copied from the question when answered, so label analytics don't need to join questions
+    correct_label = models.ForeignKey(EcgDocLabels, on_delete=models.SET_NULL, blank=True, null=True, related_name='question_attempts')
+    # Partition key on PostgreSQL: the start of the quiz attempt, so an attempt and its answers share a month partition
+    created_at = models.DateTimeField()
+
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['quiz_attempt', 'is_correct'], name='questionattempt_correct_idx'),
+        ]
 
     def __str__(self):
         return f"Attempt for Question {self.question.id} in {self.quiz_attempt}"
 
+    def save(self, *args, **kwargs):
+        # Callers pass created_at, taking it from the quiz attempt here costs a query unless it's cached
+        if self.created_at is None:
+            self.created_at = self.quiz_attempt.started_at
+        super().save(*args, **kwargs)
+
 
 class Group(models.Model):
     name = models.CharField(max_length=100)
@@ -189,6 +288,8 @@ class Group(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
 
@@ -209,9 +310,14 @@ class GroupMembership(models.Model):
     joined_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         unique_together = ['group', 'student']
         ordering = ['-joined_at']
+        indexes = [
+            models.Index(fields=['group', 'status'], name='groupmembership_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.group.name} ({self.status})"
@@ -0,0 +1,95 @@
+"""
+Monthly range partitions of the attempt tables on PostgreSQL.
+
+QuizAttempt is partitioned by started_at and QuestionAttempt by created_at, one partition per
+UTC month named "<table>_pYYYY_MM", plus a "<table>_default" partition that catches rows
+outside every monthly partition. Partitions are created ahead of time and detached once
+they're older than the retention period by the manage_partitions command.
+
+Invariant: a question attempt's created_at is its quiz attempt's started_at (see
+QuestionAttempt.save), so a quiz attempt and its question attempts are always in the same
+month. manage_partitions detaches a month from both tables in one transaction, so no quiz
+attempt is ever archived while its question attempts stay attached, or the other way round.
+"""
+import re
+from datetime import datetime, timezone
+
+from .models import QuestionAttempt, QuizAttempt
+
+# (model, partition key column); both keys hold the quiz attempt's start, so the tables are archived together
+PARTITIONED_MODELS = [
+    (QuizAttempt, 'started_at'),
+    (QuestionAttempt, 'created_at'),
+]
+
+PARTITION_NAME_RE = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def month_start(dt: datetime) -> datetime:
+    """Start of the UTC month of a datetime."""
+    dt = dt.astimezone(timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + year, month=month_index + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(cursor, table: str) -> bool:
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+    return cursor.fetchone() is not None
+
+
+def list_partitions(cursor, table: str) -> dict[datetime, str]:
+    """Return the monthly partitions attached to a table, keyed by the start of their month."""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+        [table]
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = PARTITION_NAME_RE.search(name)
+        if match:
+            partitions[datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)] = name
+    return partitions
+
+
+def create_partition(cursor, table: str, column: str, month: datetime) -> int:
+    """
+    Create the partition of a month and return how many rows it took over from the default partition.
+
+    PostgreSQL refuses to create a partition while the default partition holds rows in its
+    range, so those rows are set aside, the partition is created, and they're inserted again.
+    """
+    name = partition_name(table, month)
+    default = f"{table}_default"
+    bounds = [month, add_months(month, 1)]
+
+    cursor.execute(
+        f'CREATE TEMPORARY TABLE "{name}_moved" AS '
+        f'SELECT * FROM "{default}" WHERE "{column}" >= %s AND "{column}" < %s',
+        bounds
+    )
+    moved = cursor.rowcount
+    if moved:
+        cursor.execute(f'DELETE FROM "{default}" WHERE "{column}" >= %s AND "{column}" < %s', bounds)
+    cursor.execute(f'CREATE TABLE "{name}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)', bounds)
+    if moved:
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{name}_moved"')
+    cursor.execute(f'DROP TABLE "{name}_moved"')
+    return moved
+
+
+def detach_partition(cursor, table: str, name: str, archive_schema: str | None):
+    """Detach a partition, then move it to the archive schema, or drop it if there is none."""
+    cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+    if archive_schema:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"')
+        cursor.execute(f'ALTER TABLE "{name}" SET SCHEMA "{archive_schema}"')
+    else:
+        cursor.execute(f'DROP TABLE "{name}"')
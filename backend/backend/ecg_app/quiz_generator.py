@@ -1,6 +1,7 @@
 from django.utils import timezone
 from django.db.models import Count, Avg
-from .models import Quiz, Question, Choice, EcgSamples, EcgDocLabels, QuizAttempt, QuestionAttempt
+from .models import Quiz, Question, Choice, EcgSamples, EcgDocLabels, EcgSamplesDocLabels, QuizAttempt, QuestionAttempt
+from .catalog import get_doc_labels
 import random
 from datetime import timedelta
 import math
@@ -12,7 +13,7 @@ class QuizGenerator:
     def __init__(self, user):
         self.user = user
         self.available_samples = EcgSamples.objects.filter(doc_labels__isnull=False).distinct()
-        self.all_doc_labels = list(EcgDocLabels.objects.all())
+        self.all_doc_labels = get_doc_labels()
 
     def validate_requirements(self):
         """Validate if there are enough samples and labels to generate a quiz."""
@@ -31,11 +32,12 @@ class QuizGenerator:
             description=description
         )
 
-    def create_question(self, quiz, sample, question_text):
+    def create_question(self, quiz, sample, question_text, correct_label=None):
         """Create a question for the given quiz and sample."""
         return Question.objects.create(
             quiz=quiz,
             ecg_sample=sample,
+            correct_label=correct_label,
             question_text=question_text
         )
 
@@ -96,7 +98,8 @@ class RandomQuizGenerator(QuizGenerator):
             question = self.create_question(
                 quiz=quiz,
                 sample=sample,
-                question_text="What is the correct diagnosis for this ECG?"
+                question_text="What is the correct diagnosis for this ECG?",
+                correct_label=correct_label
             )
 
             # Create incorrect choices (distractors)
@@ -121,26 +124,22 @@ class PersonalizedQuizGenerator(QuizGenerator):
         self.max_quizzes = 10  # Number of quizzes to reach max personalization
 
     def get_user_performance_by_label(self):
-        """Calculate user's performance for each doc label."""
-        # Get all question attempts for the user
+        """Calculate user's performance for each doc label, keyed by label id."""
+        # Get the correct label, result and completion time of all question attempts for the user
         attempts = QuestionAttempt.objects.filter(
             quiz_attempt__user=self.user,
-            quiz_attempt__completed_at__isnull=False
-        ).select_related('question__ecg_sample')
+            quiz_attempt__completed_at__isnull=False,
+            correct_label__isnull=False
+        ).values_list('correct_label_id', 'is_correct', 'quiz_attempt__completed_at')
 
         # Calculate time-based weights for recent attempts
         now = timezone.now()
         max_age = timedelta(days=30)  # Maximum age to consider for weighting
 
         label_performance = {}
-        for attempt in attempts:
-            # Get the correct label for this question
-            correct_label = attempt.question.ecg_sample.doc_labels.first()
-            if not correct_label:
-                continue
-
+        for correct_label, is_correct, completed_at in attempts:
             # Calculate time-based weight (exponential decay)
-            age = now - attempt.quiz_attempt.completed_at
+            age = now - completed_at
             if age > max_age:
                 time_weight = 0.1  # Minimum weight for old attempts
             else:
@@ -158,7 +157,7 @@ class PersonalizedQuizGenerator(QuizGenerator):
             performance = label_performance[correct_label]
             performance['total'] += 1
             performance['weighted_total'] += time_weight
-            if attempt.is_correct:
+            if is_correct:
                 performance['correct'] += 1
                 performance['weighted_correct'] += time_weight
 
@@ -189,13 +188,14 @@ class PersonalizedQuizGenerator(QuizGenerator):
         personalization = self.get_personalization_factor()
         samples = list(self.available_samples)
         random.shuffle(samples)
+        sample_labels = dict(EcgSamplesDocLabels.objects.values_list('sample_id', 'label_id'))
 
         # Calculate weights for each sample
         sample_weights = []
         for sample in samples:
             # Get the correct label for this sample
-            correct_label = sample.doc_labels.first()
-            if not correct_label:
+            correct_label = sample_labels.get(sample.sample_id)
+            if correct_label is None:
                 continue
 
             # Get performance for this label
@@ -247,7 +247,8 @@ class PersonalizedQuizGenerator(QuizGenerator):
             question = self.create_question(
                 quiz=quiz,
                 sample=sample,
-                question_text="What is the correct diagnosis for this ECG?"
+                question_text="What is the correct diagnosis for this ECG?",
+                correct_label=correct_label
             )
 
             # Create incorrect choices (distractors)
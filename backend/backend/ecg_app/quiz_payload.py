@@ -0,0 +1,77 @@
+"""
+Cached payloads of generated quizzes.
+
+A quiz doesn't change once it has been generated, so its serialized JSON is stored once in the
+shared cache, zlib-compressed and keyed by quiz id, together with a strong ETag derived from
+its content. Edits through the API or the admin delete the entry, and the next read rebuilds it
+with a new ETag. Payloads embed the ECG samples of their questions, so entries also record the
+samples version they were built at, and are rebuilt once samples change, bulk ingestion included.
+"""
+import hashlib
+import zlib
+from collections.abc import Callable
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.renderers import JSONRenderer
+
+from .models import Choice, Question, Quiz
+from .versions import get_version
+
+QUIZ_PAYLOAD_TIMEOUT = 60 * 60 * 24 * 7
+
+
+class QuizPayload(NamedTuple):
+    etag: str
+    compressed: bytes
+    samples_version: int
+
+    @property
+    def content(self) -> bytes:
+        return zlib.decompress(self.compressed)
+
+
+def _payload_key(quiz_id: int) -> str:
+    return f'quiz_payload:{quiz_id}'
+
+
+def get_quiz_payload(quiz_id: int, serialize: Callable[[], dict]) -> QuizPayload:
+    """Return a quiz's cached payload, serializing the quiz only when it isn't cached or is stale."""
+    key = _payload_key(quiz_id)
+    samples_version = get_version('samples')
+    payload = cache.get(key)
+    if payload is None or payload.samples_version != samples_version:
+        content = JSONRenderer().render(serialize())
+        payload = QuizPayload(f'"{hashlib.sha256(content).hexdigest()[:32]}"', zlib.compress(content), samples_version)
+        cache.set(key, payload, QUIZ_PAYLOAD_TIMEOUT)
+    return payload
+
+
+def invalidate_quiz_payload(quiz_id):
+    """Drop a quiz's cached payload once the transaction commits."""
+    transaction.on_commit(lambda: cache.delete(_payload_key(quiz_id)))
+
+
+def _quiz_id(instance) -> int | None:
+    if isinstance(instance, Quiz):
+        return instance.pk
+    if isinstance(instance, Question):
+        return instance.quiz_id
+    if Choice.question.is_cached(instance):
+        return instance.question.quiz_id
+    return Question.objects.filter(pk=instance.question_id).values_list('quiz_id', flat=True).first()
+
+
+def _on_quiz_change(sender, instance, **kwargs):
+    quiz_id = _quiz_id(instance)
+    if quiz_id is not None:
+        invalidate_quiz_payload(quiz_id)
+
+
+def track_quiz_payloads():
+    """Invalidate cached payloads whenever a quiz, one of its questions or one of their choices changes."""
+    for model in (Quiz, Question, Choice):
+        post_save.connect(_on_quiz_change, sender=model, dispatch_uid=f'quiz_payload_{model._meta.label}_save')
+        post_delete.connect(_on_quiz_change, sender=model, dispatch_uid=f'quiz_payload_{model._meta.label}_delete')
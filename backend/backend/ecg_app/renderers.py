@@ -0,0 +1,26 @@
+import orjson
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON renderer built on orjson, for large responses.
+
+    The output is the same as the stock JSONRenderer's: compact and UTF-8, with dates, times,
+    decimals and lazy strings encoded by DRF's encoder.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+# For the renderer_classes of views serving large responses
+FAST_RENDERER_CLASSES = [ORJSONRenderer, BrowsableAPIRenderer]
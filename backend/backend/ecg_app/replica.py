@@ -0,0 +1,88 @@
+"""
+Read replica routing.
+
+Views opt in with @read_from_replica; their GET queries then run on the "replica" database
+alias when one is configured. Everything else, and every write, stays on "default". After a
+user writes anything, ReplicaStickinessMiddleware pins their reads to the primary for
+REPLICA_STICKY_SECONDS so they always see their own submissions despite replication lag.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_DB_ALIAS = 'replica'
+REPLICA_PIN_COOKIE = 'use_primary'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured() -> bool:
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def reads_from_replica(view_method, request) -> bool:
+    """Whether a view method decorated with read_from_replica runs a request's queries on the replica."""
+    return (
+        getattr(view_method, 'replica_reads', False) and replica_configured()
+        and request.method in SAFE_METHODS and REPLICA_PIN_COOKIE not in request.COOKIES
+    )
+
+
+def read_from_replica(view_method):
+    """Run a read-only view method's queries on the replica, unless the user has just written."""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or REPLICA_PIN_COOKIE in request.COOKIES:
+            return view_method(self, request, *args, **kwargs)
+        token = _replica_reads.set(True)
+        try:
+            return view_method(self, request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    wrapper.replica_reads = True
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured():
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, otherwise saving an instance read from the replica would write to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """Pin a client's reads to the primary for a while after it successfully writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_configured():
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -1,17 +1,139 @@
 import re
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import EcgSamples, EcgDocLabels, EcgSnomed, EcgSamplesDocLabels, EcgSamplesSnomed, EcgSampleValidation, ValidationHistory
 from .models import Profile, Quiz, Question, Choice, QuizAttempt, QuestionAttempt, Group, GroupMembership
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from .catalog import get_doc_label
 
-    
-class EcgSamplesSerializer(serializers.ModelSerializer):
+
+def parse_field_paths(value: str) -> dict:
+    """Parse comma separated dotted paths ("id,questions.choices.text") into a tree of nested dicts."""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class DynamicFieldsMixin:
+    """
+    Let GET requests shape the output with ?fields= and ?expand=.
+
+    fields lists the fields to keep, with dotted paths for the fields of nested serializers:
+    ?fields=id,questions.choices.text keeps the quiz id and only the text of each choice. A nested
+    field given without subpaths is kept whole.
+
+    expand lists the nested serializers to expand, also with dotted paths. Without it every nested
+    serializer is expanded as usual, with it the ones not listed are rendered as primary keys.
+
+    optimize_queryset() adds the select_related / prefetch_related lookups the requested shape needs.
+    Serializer methods that read relations declare them in Meta.method_field_lookups.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._shape = None
+
+    def _get_shape(self):
+        if self._shape is not None:
+            return self._shape
+        # Only the top level serializer reads the request, nested ones are shaped by their parent
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        request = self.context.get('request')
+        if parent is not None or request is None or request.method not in SAFE_METHODS:
+            return {}, None
+        params = request.query_params
+        fields = parse_field_paths(params['fields']) if 'fields' in params else {}
+        expand = parse_field_paths(params['expand']) if 'expand' in params else None
+        return fields, expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = self._get_shape()
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                continue
+            if expand is not None and name not in expand:
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    source=field.source, many=field is not nested, read_only=True
+                )
+            elif isinstance(nested, DynamicFieldsMixin):
+                nested._shape = (requested.get(name, {}), expand.get(name) if expand is not None else None)
+        return fields
+
+    def get_related_lookups(self, prefix: str = '', joinable: bool = True) -> tuple[list[str], list[str]]:
+        """The (select_related, prefetch_related) lookups needed to serialize the requested fields."""
+        model = self.Meta.model
+        select, prefetch = [], []
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            for lookup in getattr(self.Meta, 'method_field_lookups', {}).get(name, []):
+                prefetch.append(prefix + lookup)
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue
+            if not model_field.is_relation:
+                continue
+
+            path = prefix + field.source
+            single = model_field.many_to_one or model_field.one_to_one
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                # Primary keys of forward relations are read from the row itself
+                if not (single and model_field.concrete):
+                    prefetch.append(path)
+                continue
+
+            if single and joinable:
+                select.append(path)
+            else:
+                prefetch.append(path)
+            if isinstance(nested, DynamicFieldsMixin):
+                nested_select, nested_prefetch = nested.get_related_lookups(f'{path}__', single and joinable)
+                select += nested_select
+                prefetch += nested_prefetch
+        return select, prefetch
+
+    def optimize_queryset(self, queryset):
+        select, prefetch = self.get_related_lookups()
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class EcgSamplesSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = EcgSamples
         fields = '__all__'
 
 
+class DocLabelPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """Doc label id field looked up in the cached label catalog instead of queried per value."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            label = get_doc_label(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if label is None:
+            self.fail('does_not_exist', pk_value=data)
+        return label
+
+
 class EcgDocLabelsSerializer(serializers.ModelSerializer):
     class Meta:
         model = EcgDocLabels
@@ -36,7 +158,7 @@ class EcgSamplesSnomedSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
@@ -51,13 +173,13 @@ class ProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'role', 'date_of_birth', 'gender']
 
 
-class ChoiceSerializer(serializers.ModelSerializer):
+class ChoiceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Choice
         fields = ['id', 'text', 'is_correct']
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     choices = ChoiceSerializer(many=True, read_only=True)
     ecg_sample = EcgSamplesSerializer(read_only=True)
     
@@ -66,7 +188,7 @@ class QuestionSerializer(serializers.ModelSerializer):
         fields = ['id', 'question_text', 'choices', 'ecg_sample']
 
 
-class QuizSerializer(serializers.ModelSerializer):
+class QuizSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
     
     class Meta:
@@ -74,7 +196,7 @@ class QuizSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'created_at', 'questions']
 
 
-class QuestionAttemptSerializer(serializers.ModelSerializer):
+class QuestionAttemptSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     question = QuestionSerializer(read_only=True)
     selected_choice = ChoiceSerializer(read_only=True)
     
@@ -83,7 +205,7 @@ class QuestionAttemptSerializer(serializers.ModelSerializer):
         fields = ['id', 'question', 'selected_choice', 'is_correct']
 
 
-class QuizAttemptSerializer(serializers.ModelSerializer):
+class QuizAttemptSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     quiz = QuizSerializer()  # Nested serializer for quiz details
     user = UserSerializer()  # Add user serializer
     question_attempts = QuestionAttemptSerializer(many=True, read_only=True)
@@ -95,20 +217,27 @@ class QuizAttemptSerializer(serializers.ModelSerializer):
     class Meta:
         model = QuizAttempt
         fields = ['id', 'quiz', 'user', 'started_at', 'completed_at', 'score', 'correct_answers', 'total_questions', 'question_attempts', 'groups']
+        method_field_lookups = {
+            'score': ['question_attempts'],
+            'correct_answers': ['question_attempts'],
+            'total_questions': ['question_attempts'],
+            'groups': ['user'],
+        }
 
+    # Counted in Python, so prefetched question attempts are reused instead of queried per field
     def get_score(self, obj):
         question_attempts = obj.question_attempts.all()
-        total = question_attempts.count()
+        total = len(question_attempts)
         if total == 0:
             return 0
-        correct = question_attempts.filter(is_correct=True).count()
+        correct = sum(attempt.is_correct for attempt in question_attempts)
         return (correct / total) * 100
 
     def get_correct_answers(self, obj):
-        return obj.question_attempts.filter(is_correct=True).count()
+        return sum(attempt.is_correct for attempt in obj.question_attempts.all())
 
     def get_total_questions(self, obj):
-        return obj.question_attempts.count()
+        return len(obj.question_attempts.all())
 
     def get_groups(self, obj):
         # Get all approved group memberships for the user
@@ -360,7 +489,7 @@ class EcgSampleValidationSerializer(serializers.ModelSerializer):
     new_tag = EcgDocLabelsSerializer(read_only=True)
     history = ValidationHistorySerializer(many=True, read_only=True)
 
-    prev_tag_id = serializers.PrimaryKeyRelatedField(
+    prev_tag_id = DocLabelPrimaryKeyField(
         queryset=EcgDocLabels.objects.all(),
         source='prev_tag',
         required=False,
@@ -368,7 +497,7 @@ class EcgSampleValidationSerializer(serializers.ModelSerializer):
         write_only=True
     )
 
-    new_tag_id = serializers.PrimaryKeyRelatedField(
+    new_tag_id = DocLabelPrimaryKeyField(
         queryset=EcgDocLabels.objects.all(),
         source='new_tag',
         required=False,
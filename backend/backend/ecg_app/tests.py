@@ -1,3 +1,618 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import struct
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .data_utils.downsample import bucket_edges, lttb, minmax_envelope
+from .data_utils.files import parse_range
+from .data_utils.pack import append_to_pack, open_sample_file, pack_entry, read_packed, sample_file_exists, sample_file_hash
+from .management.commands.check_query_plans import PLAN_CHECKS, Command as CheckQueryPlansCommand
+from .models import Choice, EcgIngestionManifest, EcgSamples, Group, GroupMembership, QuestionAttempt, Question, Quiz, QuizAttempt
+from .partitions import PARTITIONED_MODELS, create_partition, is_partitioned, month_start
+from .replica import REPLICA_PIN_COOKIE, read_from_replica, reads_from_replica
+from .serializers import QuizSerializer, parse_field_paths
+from .versions import get_version, get_versions
+
+
+def write_record(directory: Path, name: str, data: np.ndarray, fs: int = 500) -> Path:
+    """Write (leads, n) int16 samples as a WFDB record with a .mat signal, returning its record path."""
+    leads, n = data.shape
+    lines = [f"{name} {leads} {fs} {n}"]
+    lines += [f"{name}.mat 16+24 1000/mV 16 0 0 0 0 L{row}" for row in range(leads)]
+    (directory / f"{name}.hea").write_text('\n'.join(lines) + '\n')
+    (directory / f"{name}.mat").write_bytes(bytes(24) + np.ascontiguousarray(data.T, dtype='<i2').tobytes())
+    return directory / name
+
+
+def unpack_waveform(body: bytes) -> tuple[dict, dict[str, np.ndarray]]:
+    """Split a waveform payload back into its metadata and arrays."""
+    length = struct.unpack('<I', body[:4])[0]
+    metadata = json.loads(body[4:4 + length])
+    arrays, offset = {}, 4 + length
+    for spec in metadata['arrays']:
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        arrays[spec['name']] = np.frombuffer(body, dtype, count, offset).reshape(spec['shape'])
+        offset += dtype.itemsize * count
+    return metadata, arrays
+
+
+class QueryPlanTests(TestCase):
+    """The hot queries listed in check_query_plans use their indexes, on a small seed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed = CheckQueryPlansCommand().seed(user_count=50, attempts_per_user=4, sample_count=500)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Tables this small are cheaper to scan, only whether an index can serve the query is checked
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_hot_queries_use_their_index(self):
+        command = CheckQueryPlansCommand()
+        for description, index_name, make_queryset in PLAN_CHECKS:
+            with self.subTest(description):
+                plan = make_queryset(self.seed).explain()
+                self.assertTrue(
+                    any(name in plan for name in command.index_names(index_name)),
+                    f"{description} does not use {index_name}:\n{plan}"
+                )
+
+
+class WaveformApiTests(TestCase):
+    """Parameters of the waveform API are validated, and broken records are reported rather than crash."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('waveform_reader')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dataset = Path(directory.name)
+        self.data = np.arange(2 * 1000, dtype=np.int16).reshape(2, 1000)
+        write_record(self.dataset, 'R1', self.data)
+        settings_override = override_settings(DATASET_SAMPLES_PATH=self.dataset)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.user)
+
+    def get(self, path='R1', **params):
+        return self.client.get(f'/api/waveforms/{path}', params)
+
+    def test_window(self):
+        response = self.get(start='0.5', stop='1', leads='L1')
+        self.assertEqual(response.status_code, 200)
+        metadata, arrays = unpack_waveform(response.content)
+        self.assertEqual((metadata['start'], metadata['stop'], metadata['leads']), (250, 500, ['L1']))
+        np.testing.assert_array_equal(arrays['samples'], self.data[1:, 250:500])
+
+    def test_window_is_clamped_to_the_record(self):
+        metadata, _ = unpack_waveform(self.get(start='-5', stop='1e308').content)
+        self.assertEqual((metadata['start'], metadata['stop']), (0, 1000))
+        metadata, _ = unpack_waveform(self.get(stop='-1').content)
+        self.assertEqual((metadata['start'], metadata['stop']), (0, 0))
+
+    def test_downsampled_levels(self):
+        metadata, arrays = unpack_waveform(self.get(width='100').content)
+        self.assertEqual(metadata['lod'], {'method': 'minmax', 'width': 256})
+        np.testing.assert_array_equal(arrays['samples'], minmax_envelope(self.data, 256))
+        # Served again from the cached level
+        _, cached = unpack_waveform(self.get(width='100').content)
+        np.testing.assert_array_equal(cached['samples'], arrays['samples'])
+
+        metadata, arrays = unpack_waveform(self.get(start='0.2', stop='1.5', width='100', method='lttb').content)
+        self.assertEqual(metadata['lod'], {'method': 'lttb', 'width': 100})
+        np.testing.assert_array_equal(arrays['samples'], np.take_along_axis(self.data[:, 100:750], arrays['index'], axis=1))
+
+    def test_invalid_parameters(self):
+        for params in [
+            {'start': 'inf'}, {'stop': '-inf'}, {'start': 'nan'}, {'start': 'abc'},
+            {'width': '0'}, {'width': '-3'}, {'leads': 'XX'}, {'dtype': 'int64'}, {'method': 'mean'},
+        ]:
+            with self.subTest(**params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_missing_and_malformed_records(self):
+        self.assertEqual(self.get('nope').status_code, 404)
+        self.assertEqual(self.get('../R1').status_code, 404)
+        (self.dataset / 'R1.hea').write_text('garbage\n')
+        self.assertEqual(self.get().status_code, 422)
+        write_record(self.dataset, 'R2', self.data)
+        (self.dataset / 'R2.mat').write_bytes(bytes(100))
+        self.assertEqual(self.get('R2').status_code, 422)
+
+
+class DownsampleTests(SimpleTestCase):
+    """The min/max envelope and LTTB keep the shape of the signal and cover all of it."""
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def test_minmax_envelope_matches_each_bucket(self):
+        for n, buckets in [(5000, 2048), (2500, 1000), (7, 3), (10, 10), (4, 8)]:
+            with self.subTest(n=n, buckets=buckets):
+                data = self.rng.integers(-2000, 2000, size=(3, n), dtype=np.int16)
+                envelope = minmax_envelope(data, buckets)
+                buckets = min(buckets, n)
+                self.assertEqual(envelope.shape, (3, 2 * buckets))
+
+                edges = bucket_edges(n, buckets)
+                self.assertEqual((edges[0], edges[-1]), (0, n))
+                for i, (start, stop) in enumerate(zip(edges[:-1], edges[1:])):
+                    bucket = data[:, start:stop]
+                    self.assertGreater(stop, start)
+                    pairs = envelope[:, 2 * i:2 * i + 2]
+                    np.testing.assert_array_equal(pairs.min(axis=1), bucket.min(axis=1))
+                    np.testing.assert_array_equal(pairs.max(axis=1), bucket.max(axis=1))
+                    # The extreme that occurs first comes first
+                    min_first = bucket.argmin(axis=1) <= bucket.argmax(axis=1)
+                    np.testing.assert_array_equal(pairs[:, 0], np.where(min_first, bucket.min(axis=1), bucket.max(axis=1)))
+
+    def test_minmax_envelope_has_no_padding(self):
+        data = np.arange(5000, dtype=np.int16)[None, :]
+        envelope = minmax_envelope(data, 2048)
+        # A ramp has a distinct envelope point for every bucket bound, none repeated
+        self.assertEqual(len(np.unique(envelope)), envelope.size)
+        self.assertEqual((envelope[0, 0], envelope[0, -1]), (0, 4999))
+
+    def test_lttb(self):
+        data = self.rng.integers(-2000, 2000, size=(2, 1000), dtype=np.int16)
+        values, indices = lttb(data, 100)
+        self.assertEqual(values.shape, (2, 100))
+        np.testing.assert_array_equal(indices[:, [0, -1]], [[0, 999], [0, 999]])
+        self.assertTrue((np.diff(indices, axis=1) > 0).all())
+        np.testing.assert_array_equal(values, np.take_along_axis(data, indices, axis=1))
+
+    def test_lttb_keeps_a_spike(self):
+        data = np.zeros((1, 1000), dtype=np.int16)
+        data[0, 537] = 1000
+        _, indices = lttb(data, 50)
+        self.assertIn(537, indices[0])
+
+    def test_lttb_short_signals_are_returned_whole(self):
+        data = np.arange(10, dtype=np.int16).reshape(1, 10)
+        values, indices = lttb(data, 20)
+        np.testing.assert_array_equal(values, data)
+        np.testing.assert_array_equal(indices[0], np.arange(10))
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_satisfiable_ranges(self):
+        for header, expected in [
+            ('bytes=0-99', (0, 99)),
+            ('bytes=100-', (100, 999)),
+            ('bytes=-100', (900, 999)),
+            ('bytes=-5000', (0, 999)),
+            ('bytes=990-5000', (990, 999)),
+            ('bytes=999-999', (999, 999)),
+        ]:
+            with self.subTest(header):
+                self.assertEqual(parse_range(header, 1000), expected)
+
+    def test_ignored_headers(self):
+        # The whole file is served instead
+        for header in [None, '', 'items=0-1', 'bytes=0-1,5-6', 'bytes=abc', 'bytes=-', 'bytes=5-1', 'bytes=1-x']:
+            with self.subTest(header):
+                self.assertIsNone(parse_range(header, 1000))
+
+    def test_unsatisfiable_ranges(self):
+        for header, size in [('bytes=1000-', 1000), ('bytes=2000-3000', 1000), ('bytes=-0', 1000), ('bytes=-10', 0), ('bytes=0-', 0)]:
+            with self.subTest(header, size=size):
+                with self.assertRaises(ValueError):
+                    parse_range(header, size)
+
+
+@override_settings(DATASET_ACCEL_REDIRECT_PREFIX='')
+class ImageRangeTests(TestCase):
+    """Images served by Django answer conditional and byte-range requests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('image_reader')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.content = bytes(range(256)) * 4
+        (Path(directory.name) / 'R1.png').write_bytes(self.content)
+        settings_override = override_settings(DATASET_SAMPLES_PATH=Path(directory.name))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.user)
+
+    def get(self, headers=None):
+        response = self.client.get('/api/images/R1.png', headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_whole_file(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, self.content))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range(self):
+        response, body = self.get({'Range': 'bytes=10-19'})
+        self.assertEqual((response.status_code, body), (206, self.content[10:20]))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        response, body = self.get({'Range': 'bytes=-4'})
+        self.assertEqual((response.status_code, body, response['Content-Range']), (206, self.content[-4:], 'bytes 1020-1023/1024'))
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get({'Range': 'bytes=5000-'})
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */1024'))
+
+    def test_conditional_requests(self):
+        etag = self.get()[0]['ETag']
+        self.assertEqual(self.get({'If-None-Match': etag})[0].status_code, 304)
+        # A stale If-Range gets the whole file instead of the range
+        response, body = self.get({'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual((response.status_code, body), (200, self.content))
+        response, body = self.get({'Range': 'bytes=0-9', 'If-Range': etag})
+        self.assertEqual((response.status_code, body), (206, self.content[:10]))
+
+
+class PackTests(SimpleTestCase):
+    """Packed copies are read until their loose file changes, then the loose file wins until repacked."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'R1.hea'
+        self.path.write_bytes(b'packed')
+        append_to_pack(self.path.parent, [self.path])
+
+    def read(self):
+        with open_sample_file(self.path) as f:
+            return f.read()
+
+    def test_packed_copy_is_read(self):
+        self.assertEqual(bytes(read_packed(self.path)), b'packed')
+        self.path.unlink()
+        self.assertTrue(sample_file_exists(self.path))
+        self.assertEqual(self.read(), b'packed')
+
+    def test_changed_loose_file_wins_until_repacked(self):
+        self.path.write_bytes(b'edited!')
+        self.assertIsNone(pack_entry(self.path))
+        self.assertIsNone(read_packed(self.path))
+        self.assertEqual(self.read(), b'edited!')
+        self.assertEqual(sample_file_hash(self.path), hashlib.sha256(b'edited!').hexdigest())
+
+        self.assertEqual(append_to_pack(self.path.parent, [self.path]), 1)
+        self.path.unlink()
+        self.assertEqual(self.read(), b'edited!')
+
+
+def partition_of(model, pk):
+    """Name of the partition holding a row."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT tableoid::regclass::text FROM "{model._meta.db_table}" WHERE id = %s', [pk])
+        row = cursor.fetchone()
+    return row and row[0]
+
+
+@skipUnless(connection.vendor == 'postgresql', "Partitioning requires PostgreSQL")
+class PartitionTests(TestCase):
+    """Question attempts live in their quiz attempt's month partition, and months are detached from both tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('partition_student')
+        quiz = Quiz.objects.create(title='Partitions')
+        cls.question = Question.objects.create(quiz=quiz, ecg_sample=EcgSamples.objects.create(sample_path='p/1'), question_text='')
+
+    def attempt(self, started_at):
+        quiz_attempt = QuizAttempt.objects.create(user=self.user, quiz=self.question.quiz)
+        QuizAttempt.objects.filter(pk=quiz_attempt.pk).update(started_at=started_at)
+        quiz_attempt.refresh_from_db()
+        answer = QuestionAttempt.objects.create(quiz_attempt=quiz_attempt, question=self.question, created_at=quiz_attempt.started_at)
+        return quiz_attempt, answer
+
+    def create_partitions(self, month):
+        with connection.cursor() as cursor:
+            for model, column in PARTITIONED_MODELS:
+                create_partition(cursor, model._meta.db_table, column, month)
+
+    def test_answers_share_their_attempt_month(self):
+        quiz_attempt, answer = self.attempt(timezone.now())
+        month = f"_p{month_start(quiz_attempt.started_at):%Y_%m}"
+        self.assertTrue(partition_of(QuizAttempt, quiz_attempt.pk).endswith(month))
+        self.assertTrue(partition_of(QuestionAttempt, answer.pk).endswith(month))
+
+        # Without created_at, the answer still takes its quiz attempt's start
+        fallback = QuestionAttempt.objects.create(quiz_attempt_id=quiz_attempt.pk, question=self.question)
+        self.assertEqual(fallback.created_at, quiz_attempt.started_at)
+
+    def test_old_months_are_detached_from_both_tables(self):
+        old_attempt, old_answer = self.attempt(timezone.now() - timedelta(days=400))
+        recent_attempt, recent_answer = self.attempt(timezone.now())
+        self.assertTrue(partition_of(QuizAttempt, old_attempt.pk).endswith('_default'))
+
+        # Creating the month's partitions moves the rows out of the default partitions
+        self.create_partitions(month_start(old_attempt.started_at))
+        self.assertFalse(partition_of(QuestionAttempt, old_answer.pk).endswith('_default'))
+
+        # Run the deferred foreign key checks now, as a standalone run of the command would have none pending
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        call_command('manage_partitions', retain_months=6, drop=True, stdout=open(os.devnull, 'w'))
+        self.assertFalse(QuizAttempt.objects.filter(pk=old_attempt.pk).exists())
+        self.assertFalse(QuestionAttempt.objects.filter(pk=old_answer.pk).exists())
+        self.assertTrue(QuizAttempt.objects.filter(pk=recent_attempt.pk).exists())
+        self.assertTrue(QuestionAttempt.objects.filter(pk=recent_answer.pk).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', "Partitioning requires PostgreSQL")
+class PartitionMigrationTests(TransactionTestCase):
+    """Migration 0016 partitions the attempt tables and back, keeping their rows, ids and indexes."""
+
+    before = [('ecg_app', '0015_questionattempt_created_at')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_partition_and_unpartition(self):
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes('ecg_app')
+        self.addCleanup(self.migrate, latest)
+        apps = self.migrate(self.before)
+
+        user = apps.get_model('auth', 'User').objects.create(username='migrated_student')
+        quiz = apps.get_model('ecg_app', 'Quiz').objects.create(title='Migrated')
+        sample = apps.get_model('ecg_app', 'EcgSamples').objects.create(sample_path='m/1')
+        question = apps.get_model('ecg_app', 'Question').objects.create(quiz=quiz, ecg_sample=sample, question_text='')
+        started_at = timezone.now() - timedelta(days=60)
+        quiz_attempt = apps.get_model('ecg_app', 'QuizAttempt').objects.create(user=user, quiz=quiz)
+        apps.get_model('ecg_app', 'QuizAttempt').objects.filter(pk=quiz_attempt.pk).update(started_at=started_at)
+        answer = apps.get_model('ecg_app', 'QuestionAttempt').objects.create(quiz_attempt=quiz_attempt, question=question, created_at=started_at)
+
+        self.migrate(latest)
+        month = f"_p{month_start(started_at):%Y_%m}"
+        with connection.cursor() as cursor:
+            self.assertTrue(all(is_partitioned(cursor, model._meta.db_table) for model, _ in PARTITIONED_MODELS))
+        self.assertTrue(partition_of(QuizAttempt, quiz_attempt.pk).endswith(month))
+        self.assertTrue(partition_of(QuestionAttempt, answer.pk).endswith(month))
+        self.assertEqual(QuestionAttempt.objects.get(pk=answer.pk).quiz_attempt_id, quiz_attempt.pk)
+        # Ids continue after the copied rows, and the composite indexes were replayed on the partitioned tables
+        new_attempt = QuizAttempt.objects.create(user_id=user.pk, quiz_id=quiz.pk)
+        self.assertGreater(new_attempt.pk, quiz_attempt.pk)
+        self.assertIn('quizattempt_user_started_idx', connection.introspection.get_constraints(connection.cursor(), QuizAttempt._meta.db_table))
+
+        self.migrate(self.before)
+        with connection.cursor() as cursor:
+            self.assertFalse(any(is_partitioned(cursor, model._meta.db_table) for model, _ in PARTITIONED_MODELS))
+        self.assertEqual(partition_of(QuestionAttempt, answer.pk), QuestionAttempt._meta.db_table)
+        self.assertEqual(QuizAttempt.objects.filter(pk__in=[quiz_attempt.pk, new_attempt.pk]).count(), 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'versions'}})
+class VersionedCacheTests(TestCase):
+    """Writes bump the versions cached views are keyed on, and replica-computed entries stay apart."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('cache_teacher', is_staff=True)
+        cls.student = User.objects.create_user('cache_student')
+        cls.group = Group.objects.create(name='Cached', teacher=cls.teacher)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def list_groups(self):
+        """Group names listed, and whether the database was queried for them."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/groups/')
+        self.assertEqual(response.status_code, 200)
+        return sorted(group['name'] for group in response.data), len(queries) > 0
+
+    def test_save_bumps_the_entity_and_its_user(self):
+        entity = get_version('group_membership')
+        student, teacher = get_versions(['group_membership'], self.student.pk), get_versions(['group_membership'], self.teacher.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupMembership.objects.create(group=self.group, student=self.student)
+        self.assertNotEqual(get_version('group_membership'), entity)
+        self.assertNotEqual(get_versions(['group_membership'], self.student.pk), student)
+        self.assertEqual(get_versions(['group_membership'], self.teacher.pk), teacher)
+
+    def test_versions_are_bumped_on_commit(self):
+        version = get_version('group')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Group.objects.create(name='Uncommitted', teacher=self.teacher)
+        self.assertEqual(get_version('group'), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_version('group'), version)
+
+    def test_bulk_update_bumps_every_user(self):
+        GroupMembership.objects.create(group=self.group, student=self.student)
+        teacher = get_versions(['group_membership'], self.teacher.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupMembership.objects.filter(group=self.group).update(status='approved')
+        self.assertNotEqual(get_versions(['group_membership'], self.teacher.pk), teacher)
+
+    def test_cached_view_recomputes_after_a_write(self):
+        self.assertEqual(self.list_groups(), (['Cached'], True))
+        self.assertEqual(self.list_groups(), (['Cached'], False))
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.create(name='Added', teacher=self.teacher)
+        self.assertEqual(self.list_groups(), (['Added', 'Cached'], True))
+
+    def test_only_unpinned_replica_views_read_from_replica(self):
+        view = read_from_replica(lambda self, request: None)
+        request = RequestFactory().get('/api/groups/')
+        with mock.patch('ecg_app.replica.replica_configured', return_value=True):
+            self.assertTrue(reads_from_replica(view, request))
+            self.assertFalse(reads_from_replica(lambda self, request: None, request))
+            request.COOKIES[REPLICA_PIN_COOKIE] = '1'
+            self.assertFalse(reads_from_replica(view, request))
+
+    @override_settings(REPLICA_CACHE_TIMEOUT=30)
+    def test_replica_entries_expire_sooner_and_skip_pinned_clients(self):
+        with mock.patch('ecg_app.versions.reads_from_replica', return_value=True), \
+                mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.assertEqual(self.list_groups(), (['Cached'], True))
+            self.assertEqual(self.list_groups(), (['Cached'], False))
+        (key, _, timeout), _ = cache_set.call_args
+        self.assertTrue(key.endswith(':replica'))
+        self.assertEqual(timeout, 30)
+
+        # A client pinned to the primary after a write doesn't read what the replica computed,
+        # and what it computes on the primary is then used by everyone
+        with mock.patch('ecg_app.versions.reads_from_replica', return_value=False):
+            self.assertEqual(self.list_groups(), (['Cached'], True))
+            self.assertEqual(self.list_groups(), (['Cached'], False))
+        cache.delete(key)
+        with mock.patch('ecg_app.versions.reads_from_replica', return_value=True):
+            self.assertEqual(self.list_groups(), (['Cached'], False))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'quiz-payloads'}})
+class QuizRetrieveTests(TestCase):
+    """Quizzes are revalidated on every read, with a 304 while they're unchanged."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('quiz_reader', is_staff=True)
+        cls.quiz = Quiz.objects.create(title='Rhythms')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_edits_change_the_etag(self):
+        url = f'/api/quizzes/{self.quiz.pk}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        etag = response['ETag']
+
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'title': 'Conduction'}, format='json')
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['title'], 'Conduction')
+
+
+class IngestionManifestTests(TestCase):
+    """populate_ecg_data only ingests samples whose files or linked SNOMED codes changed."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.samples_dir = Path(directory.name, 'samples')
+        (self.samples_dir / 'ds').mkdir(parents=True)
+        self.snomed_csv = Path(directory.name, 'snomed.csv')
+        self.snomed_csv.write_text('code,desc\n164889003,atrial fibrillation\n')
+        self.records = [write_record(self.samples_dir / 'ds', name, np.zeros((2, 100), np.int16)) for name in ('A1', 'A2')]
+
+    def ingest(self) -> str:
+        stdout = io.StringIO()
+        call_command('populate_ecg_data', snomed_csv=str(self.snomed_csv), samples_dir=str(self.samples_dir), workers=1, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_unchanged_samples_are_skipped(self):
+        self.assertIn("(2 new, 0 changed, 0 unchanged, 0 removed from manifest)", self.ingest())
+        self.assertIn("(0 new, 0 changed, 2 unchanged, 0 removed from manifest)", self.ingest())
+
+    def test_touched_files_are_hashed_but_not_reingested(self):
+        self.ingest()
+        mat = self.records[0].with_suffix('.mat')
+        os.utime(mat, (mat.stat().st_atime, mat.stat().st_mtime + 60))
+        self.assertIn("(0 new, 0 changed, 2 unchanged", self.ingest())
+        self.assertEqual(EcgIngestionManifest.objects.get(path=str(self.records[0].with_suffix('.hea'))).mtime, mat.stat().st_mtime)
+
+    def test_changed_content_is_reingested(self):
+        self.ingest()
+        write_record(self.samples_dir / 'ds', 'A1', np.ones((2, 100), np.int16))
+        self.assertIn("(0 new, 1 changed, 1 unchanged", self.ingest())
+
+    def test_new_snomed_codes_reingest_every_sample(self):
+        self.ingest()
+        with open(self.snomed_csv, 'a') as csvfile:
+            csvfile.write('426783006,sinus rhythm\n')
+        self.assertIn("(0 new, 2 changed, 0 unchanged", self.ingest())
+
+    def test_deleted_samples_leave_the_manifest(self):
+        self.ingest()
+        for suffix in ('.hea', '.mat'):
+            self.records[1].with_suffix(suffix).unlink()
+        self.assertIn("(0 new, 0 changed, 1 unchanged, 1 removed from manifest)", self.ingest())
+        self.assertEqual(EcgIngestionManifest.objects.count(), 1)
+
+
+class DynamicFieldsTests(TestCase):
+    """?fields= and ?expand= shape nested serializers, and the queryset prefetches only what they keep."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.quiz = Quiz.objects.create(title='Shapes', description='')
+        cls.sample = EcgSamples.objects.create(sample_path='shapes/1')
+        question = Question.objects.create(quiz=cls.quiz, ecg_sample=cls.sample, question_text='Rhythm?')
+        cls.choice = Choice.objects.create(question=question, text='Sinus', is_correct=True)
+
+    def serialize(self, method='get', **params):
+        request = Request(getattr(APIRequestFactory(), method)('/api/quizzes/', params))
+        return QuizSerializer(self.quiz, context={'request': request})
+
+    def test_parse_field_paths(self):
+        self.assertEqual(parse_field_paths('id, questions.choices.text,questions.id,'), {
+            'id': {}, 'questions': {'choices': {'text': {}}, 'id': {}},
+        })
+
+    def test_fields_keep_dotted_paths(self):
+        data = self.serialize(fields='id,questions.choices.text').data
+        self.assertEqual(json.loads(json.dumps(data)), {'id': self.quiz.pk, 'questions': [{'choices': [{'text': 'Sinus'}]}]})
+
+    def test_nested_field_without_subpaths_is_kept_whole(self):
+        question = self.serialize(fields='questions').data['questions'][0]
+        self.assertEqual(set(question), {'id', 'question_text', 'choices', 'ecg_sample'})
+        self.assertEqual(question['ecg_sample']['sample_path'], 'shapes/1')
+
+    def test_expand_renders_other_nested_serializers_as_keys(self):
+        question = self.serialize(expand='questions.choices').data['questions'][0]
+        self.assertEqual(question['ecg_sample'], self.sample.pk)
+        self.assertEqual(question['choices'][0]['text'], 'Sinus')
+        self.assertEqual(self.serialize(expand='').data['questions'], [question['id']])
+
+    def test_writes_are_not_shaped(self):
+        self.assertIn('title', self.serialize(method='post', fields='id').fields)
+
+    def test_lookups_follow_the_requested_fields(self):
+        self.assertEqual(self.serialize(fields='id,questions.ecg_sample.sample_path').get_related_lookups(), (
+            [], ['questions', 'questions__ecg_sample'],
+        ))
+        self.assertEqual(self.serialize(fields='id,questions.id', expand='').get_related_lookups(), ([], ['questions']))
+        self.assertEqual(self.serialize(fields='id,title').get_related_lookups(), ([], []))
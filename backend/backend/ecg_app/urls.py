@@ -4,13 +4,16 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from .views.auth import api_csrf, api_login, api_logout, api_user_status, api_register, api_password_reset_request, api_password_reset_confirm
+from .views.database import database_pool_stats
 from .views.group import GroupViewSet, GroupMembershipViewSet, GroupMembershipRequestViewSet
-from .views.image import serve_ecg_image
+from .views.image import serve_ecg_image, serve_ecg_render
 from .views.profile import ProfileByUsernameView, ProfileViewSet, update_user_profile
 from .views.quiz import CheckAnswerView, QuizAttemptViewSet, QuizViewSet
+from .views.tiles import serve_ecg_tile, serve_ecg_tile_descriptor
 from .views.templates import home, view_ecg_samples, view_ecg_samples_snomed, view_ecg_snomed, view_users, view_quizzes, view_quiz_attempts
 from .views.statistics import UserStatisticsView
 from .views.validation import EcgSampleValidationViewSet
+from .views.waveform import serve_ecg_waveform
 
 
 DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
@@ -41,11 +44,20 @@ urlpatterns = [
     path('api/profiles/by-username/<str:username>/', ProfileByUsernameView.as_view(), name='profile-by-username'),
     # Statistics API endpoint
     path('api/statistics/user/<int:user_id>/', UserStatisticsView.as_view(), name='user-statistics'),
+    # Database connection pool statistics of the serving worker (admins only)
+    path('api/admin/database-pool/', database_pool_stats, name='database_pool_stats'),
     # General API endpoints
     path('api/check-answer/', CheckAnswerView.as_view(), name='check-answer'),
     # Image serving endpoint - handle both with and without .png extension
     path('api/images/<path:image_path>.png', serve_ecg_image, name='serve_ecg_image'),
     path('api/images/<path:image_path>', serve_ecg_image, name='serve_ecg_image_no_ext'),
+    # Rendered image endpoint - 12-lead sheet rendered from the signal at a requested size
+    path('api/renders/<path:sample_path>', serve_ecg_render, name='serve_ecg_render'),
+    # Deep Zoom tile pyramid endpoints - .dzi descriptor and the tiles of each level
+    path('api/tiles/<path:sample_path>_files/<int:level>/<int:col>_<int:row>.<str:fmt>', serve_ecg_tile, name='serve_ecg_tile'),
+    path('api/tiles/<path:sample_path>.dzi', serve_ecg_tile_descriptor, name='serve_ecg_tile_descriptor'),
+    # Waveform serving endpoint - compact binary signal of a sample record
+    path('api/waveforms/<path:sample_path>', serve_ecg_waveform, name='serve_ecg_waveform'),
 ]
 
 if DEBUG:
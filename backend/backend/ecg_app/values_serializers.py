@@ -0,0 +1,136 @@
+"""
+Read-only serializers building rows straight from values_list() tuples.
+
+They skip model instantiation and per-field serializer calls, for list endpoints returning
+thousands of rows. A serializer declares its output as a dict of output names to:
+    * a lookup ("sample__sample_path"),
+    * Column(lookup, transform) for values that need converting,
+    * Nested(fields, null_if=lookup) for a nested object, None when the null_if lookup is,
+    * Many(model, parent_lookup, fields) for a list of related rows, fetched for every row in one query.
+"""
+import operator
+from collections import defaultdict
+from collections.abc import Callable
+
+from .models import Profile, ValidationHistory
+
+
+class Column:
+    def __init__(self, lookup: str, transform: Callable):
+        self.lookup = lookup
+        self.transform = transform
+
+
+class Nested:
+    def __init__(self, fields: dict, null_if: str | None = None):
+        self.fields = fields
+        self.null_if = null_if
+
+
+class Many:
+    def __init__(self, model, parent_lookup: str, fields: dict, key: str = 'pk', order_by: tuple = ()):
+        self.model = model
+        self.parent_lookup = parent_lookup
+        self.fields = fields
+        self.key = key
+        self.order_by = order_by
+
+
+def _row_builder(fields: dict, lookups: list[str], queryset) -> Callable[[tuple], dict]:
+    """Return a function building a row from a values_list() tuple, adding the lookups it reads to lookups."""
+    def column(lookup):
+        if lookup not in lookups:
+            lookups.append(lookup)
+        return operator.itemgetter(lookups.index(lookup))
+
+    getters = []
+    for name, spec in fields.items():
+        if isinstance(spec, str):
+            get = column(spec)
+        elif isinstance(spec, Column):
+            get = lambda row, value=column(spec.lookup), transform=spec.transform: transform(value(row))
+        elif isinstance(spec, Nested):
+            build = _row_builder(spec.fields, lookups, queryset)
+            if spec.null_if:
+                get = lambda row, build=build, key=column(spec.null_if): None if key(row) is None else build(row)
+            else:
+                get = build
+        elif isinstance(spec, Many):
+            children = spec.model._default_manager.filter(
+                **{f'{spec.parent_lookup}__in': queryset.values(spec.key)}
+            ).order_by(*spec.order_by)
+            child_lookups = [spec.parent_lookup]
+            build = _row_builder(spec.fields, child_lookups, children)
+            groups = defaultdict(list)
+            for child in children.values_list(*child_lookups):
+                groups[child[0]].append(build(child))
+            get = lambda row, groups=groups, key=column(spec.key): groups.get(key(row), [])
+        else:
+            raise TypeError(f"Unsupported field {name!r}: {spec!r}")
+        getters.append((name, get))
+
+    return lambda row: {name: get(row) for name, get in getters}
+
+
+class ValuesSerializer:
+    """Serialize a queryset into a list of dicts, declared by the fields class attribute."""
+    fields: dict = {}
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    @property
+    def data(self) -> list[dict]:
+        lookups = []
+        build = _row_builder(self.fields, lookups, self.queryset)
+        return [build(row) for row in self.queryset.values_list(*lookups)]
+
+
+def _doc_label(relation: str) -> Nested:
+    return Nested({
+        'label_id': f'{relation}__label_id',
+        'label_desc': f'{relation}__label_desc',
+    }, null_if=f'{relation}__label_id')
+
+
+_ROLE_DISPLAY = dict(Profile._meta.get_field('role').flatchoices)
+
+
+class ProfileValuesSerializer(ValuesSerializer):
+    """Same output as ProfileSerializer."""
+    fields = {
+        'id': 'id',
+        'user': Nested({
+            'id': 'user__id',
+            'username': 'user__username',
+            'email': 'user__email',
+            'first_name': 'user__first_name',
+            'last_name': 'user__last_name',
+        }),
+        'role': Column('role', lambda role: _ROLE_DISPLAY.get(role, role)),
+        'date_of_birth': 'date_of_birth',
+        'gender': 'gender',
+    }
+
+
+class PendingSampleValuesSerializer(ValuesSerializer):
+    fields = {
+        'id': 'id',
+        'sample_id': 'sample__sample_id',
+        'path': 'sample__sample_path',
+        'prev_tag': _doc_label('prev_tag'),
+        'new_tag': _doc_label('new_tag'),
+    }
+
+
+class ValidatedSampleValuesSerializer(ValuesSerializer):
+    fields = {
+        **PendingSampleValuesSerializer.fields,
+        'history': Many(ValidationHistory, 'validation', {
+            'validated_by': 'validated_by__username',
+            'prev_tag': _doc_label('prev_tag'),
+            'new_tag': _doc_label('new_tag'),
+            'comment': 'comment',
+            'created_at': 'created_at',
+        }, order_by=('-created_at',)),
+    }
@@ -0,0 +1,195 @@
+"""
+Version counters for cache invalidation.
+
+Every tracked entity (one or more models) has a version counter in the shared cache, and entities
+whose rows belong to users also have a counter per user. Cache keys embed the versions of the
+entities their data was computed from, so bumping a version makes every dependent entry
+unreachable in all workers at once, and the entries simply expire.
+
+Versions are bumped once the writing transaction commits:
+    * post_save / post_delete bump the entity, and the per-user counters of the row's users.
+    * Bulk operations of VersionedQuerySet (update, bulk_create, bulk_update), which send no
+      signals, bump the entity and every user's counter of it.
+"""
+import hashlib
+import time
+from collections.abc import Callable, Iterable
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from .replica import reads_from_replica
+
+DEFAULT_TIMEOUT = 60 * 60
+
+# Model -> (entity name, function returning the ids of the users a row belongs to, or None)
+_TRACKED_MODELS: dict[type[models.Model], tuple[str, Callable[[models.Model], Iterable[int]] | None]] = {}
+_USER_ENTITIES: set[str] = set()
+
+
+def _new_version() -> int:
+    # Time based, so a counter lost from the cache never comes back as a value that was used before
+    return time.time_ns() // 1000
+
+
+def _entity_key(entity: str) -> str:
+    return f'version:{entity}'
+
+
+def _users_key(entity: str) -> str:
+    return f'version:{entity}:users'
+
+
+def _user_key(entity: str, user_id: int) -> str:
+    return f'version:{entity}:user:{user_id}'
+
+
+def _get_counters(keys: list[str]) -> list[int]:
+    counters = cache.get_many(keys)
+    missing = [key for key in keys if key not in counters]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), timeout=None)
+        counters.update(cache.get_many(missing))
+    return [counters[key] for key in keys]
+
+
+def _bump_counters(keys: Iterable[str]):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
+
+
+def get_versions(entities: Iterable[str], user_id: int | None = None) -> tuple[int, ...]:
+    """
+    Versions of entities. With a user, per-user entities are versioned by that user's counter
+    (and the bulk counter of all users) instead of the entity counter.
+    """
+    keys = []
+    for entity in entities:
+        if user_id is not None and entity in _USER_ENTITIES:
+            keys += [_users_key(entity), _user_key(entity, user_id)]
+        else:
+            keys.append(_entity_key(entity))
+    return tuple(_get_counters(keys))
+
+
+def get_version(entity: str) -> int:
+    return get_versions([entity])[0]
+
+
+def bump_version(entity: str, user_ids: Iterable[int] = (), all_users: bool = False):
+    """Bump an entity's version and the versions of some or all of its users, once the transaction commits."""
+    keys = [_entity_key(entity)]
+    if all_users:
+        keys.append(_users_key(entity))
+    keys += [_user_key(entity, user_id) for user_id in set(user_ids) if user_id is not None]
+    transaction.on_commit(lambda: _bump_counters(keys))
+
+
+def _on_row_change(sender, instance, **kwargs):
+    entity, get_user_ids = _TRACKED_MODELS[sender]
+    bump_version(entity, get_user_ids(instance) if get_user_ids else ())
+
+
+def track_model(model: type[models.Model], entity: str, user_ids: Callable[[models.Model], Iterable[int]] | None = None):
+    """Bump an entity's version whenever rows of a model are saved or deleted."""
+    _TRACKED_MODELS[model] = (entity, user_ids)
+    if user_ids:
+        _USER_ENTITIES.add(entity)
+    post_save.connect(_on_row_change, sender=model, dispatch_uid=f'versions_{model._meta.label}_save')
+    post_delete.connect(_on_row_change, sender=model, dispatch_uid=f'versions_{model._meta.label}_delete')
+
+
+def bump_model_version(model: type[models.Model]):
+    """Bump the version of a tracked model's entity for all its users, after a bulk operation."""
+    if model in _TRACKED_MODELS:
+        bump_version(_TRACKED_MODELS[model][0], all_users=True)
+
+
+class VersionedQuerySet(models.QuerySet):
+    """QuerySet whose bulk operations bump the version of the model's entity."""
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            bump_model_version(self.model)
+        return rows
+
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        if objs:
+            bump_model_version(self.model)
+        return objs
+
+    def bulk_update(self, *args, **kwargs):
+        rows = super().bulk_update(*args, **kwargs)
+        if rows:
+            bump_model_version(self.model)
+        return rows
+
+
+def versioned_key(name: str, entities: Iterable[str], user_id: int | None = None, *parts) -> str:
+    versions = '.'.join(map(str, get_versions(entities, user_id)))
+    return ':'.join([name, versions, *map(str, parts)])
+
+
+def cached_data(name: str, entities: Iterable[str], compute: Callable, user_id: int | None = None, *parts, timeout: int = DEFAULT_TIMEOUT):
+    """Return computed data (e.g. serializer output) cached under the current versions of the entities it depends on."""
+    key = versioned_key(name, entities, user_id, *parts)
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, timeout)
+    return data
+
+
+def cached_view(*entities: str, scope_user: Callable | None = None, vary_on_user: bool = True, timeout: int = DEFAULT_TIMEOUT):
+    """
+    Cache the data of a DRF view method's successful GET responses under the versions of the entities it reads.
+
+    scope_user(request, *args, **kwargs) returns the user whose data the view shows, whose per-user
+    versions are then used. Responses are also keyed by the requesting user unless vary_on_user is
+    False, for views whose output doesn't depend on who asks.
+
+    Views decorated with read_from_replica compute misses on the replica unless the client is pinned
+    to the primary. A lagging replica can return data older than the versions in the key, so those
+    entries are kept apart from the primary's and expire after REPLICA_CACHE_TIMEOUT at most, which
+    bounds how stale they get. Pinned clients only read entries computed on the primary, so they
+    always see their own writes.
+    """
+    def decorator(view_method):
+        name = f'view:{view_method.__module__}.{view_method.__qualname__}'
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return view_method(self, request, *args, **kwargs)
+
+            user_id = scope_user(request, *args, **kwargs) if scope_user else None
+            path_hash = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+            key = versioned_key(name, entities, user_id, request.user.pk if vary_on_user else '', path_hash)
+            replica = reads_from_replica(view_method, request)
+            replica_key = f'{key}:replica'
+            # Entries computed on the primary are never staler, so they're used first
+            cached = cache.get_many([key, replica_key] if replica else [key])
+            data = cached.get(key, cached.get(replica_key))
+            if data is not None:
+                return Response(data)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                if replica:
+                    cache.set(replica_key, response.data, min(timeout, settings.REPLICA_CACHE_TIMEOUT))
+                else:
+                    cache.set(key, response.data, timeout)
+            return response
+        return wrapper
+    return decorator
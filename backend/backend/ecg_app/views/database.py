@@ -0,0 +1,40 @@
+import os
+
+from django.db import connections
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+
+def _pool_stats(connection):
+    """Connection pool counters of a database alias, with the average wait for a connection."""
+    pool = connection.pool if connection.vendor == 'postgresql' else None
+    if pool is None:
+        return {
+            'pool': None,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        }
+
+    # psycopg_pool only reports counters that have been incremented
+    stats = pool.get_stats()
+    queued = stats.get('requests_queued', 0)
+    return {
+        'pool': stats,
+        'average_wait_ms': round(stats.get('requests_wait_ms', 0) / queued, 2) if queued else 0,
+        'waiting_share': round(queued / stats['requests_num'], 4) if stats.get('requests_num') else 0,
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def database_pool_stats(request):
+    """
+    Database connection statistics of the worker process that serves the request.
+
+    Every gunicorn worker has its own pool, so repeated calls may report different workers.
+    """
+    return Response({
+        'pid': os.getpid(),
+        'databases': {alias: _pool_stats(connections[alias]) for alias in connections},
+    })
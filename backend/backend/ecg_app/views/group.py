@@ -9,6 +9,8 @@ from ..serializers import (
     GroupSerializer, GroupDetailSerializer, GroupMembershipSerializer, GroupMembershipRequestSerializer
 )
 from ..permissions import CanManageGroupMembers
+from ..replica import read_from_replica
+from ..versions import cached_view
 
 
 class GroupViewSet(viewsets.ModelViewSet):
@@ -35,6 +37,11 @@ class GroupViewSet(viewsets.ModelViewSet):
                 Q(memberships__student=user, memberships__status='approved')  # Groups where user is a member
             ).distinct()
 
+    @cached_view('group', 'group_membership', 'user')
+    @read_from_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(teacher=self.request.user)
 
@@ -209,6 +216,8 @@ class GroupViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @cached_view('group', 'group_membership', 'user')
+    @read_from_replica
     def my_groups(self, request):
         user = request.user
         if user.is_staff:
@@ -1,45 +1,199 @@
+import mimetypes
 import os
+from concurrent.futures import TimeoutError as RenderTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import quote
+
 from django.conf import settings
-from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from ..data_utils.derivatives import DERIVATIVE_CONTENT_TYPES, DERIVATIVE_VARIANTS
+from ..data_utils.files import get_file_info, parse_range
+from ..data_utils.pack import open_sample_file, pack_entry, sample_file_exists
+from ..data_utils.render import RenderCache, render_cached
+from ..data_utils.sample import HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX, resolve_sample_path
+from ..models import EcgImageDerivative
+from ..versions import get_version
+
+# Served files only change along with their path or content, which the ETag covers
+IMAGE_CACHE_CONTROL = 'private, max-age=2592000'
+
+
+@lru_cache(maxsize=8192)
+def _resolve_image_path(data_dir, image_path):
+    """
+    Return the (dataset-relative, absolute) path of an ECG image, memoized per requested path.
+
+    Invalid or missing images raise Http404, and since exceptions are not cached by
+    lru_cache, images added to the dataset later are still found.
+    """
+    if not image_path.lower().endswith('.png'):
+        image_path += '.png'
+
+    full_path = resolve_sample_path(data_dir, image_path)
+    if full_path is None:
+        raise Http404("Invalid image path")
+    if not sample_file_exists(full_path):
+        raise Http404("Image not found")
+    return os.path.relpath(full_path, data_dir), str(full_path)
+
+
+def _serve_file(request, full_path, content_type=None):
+    """
+    Serve a file through Django, answering conditional and single byte-range requests.
+
+    ETag and Last-Modified come from the cached file metadata, so a revalidation costs one
+    stat() and a 304, and a range request reads only the requested bytes.
+    """
+    try:
+        info = get_file_info(full_path)
+    except FileNotFoundError:
+        raise Http404("Image not found")
+    content_type = content_type or info.content_type
+
+    response = get_conditional_response(request, etag=info.etag, last_modified=int(info.mtime))
+    if response is None:
+        byte_range = None
+        if request.headers.get('If-Range') in (None, info.etag, http_date(info.mtime)):
+            try:
+                byte_range = parse_range(request.headers.get('Range'), info.size)
+            except ValueError:
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response['Content-Range'] = f"bytes */{info.size}"
+                return response
+
+        if byte_range:
+            start, end = byte_range
+            with open_sample_file(Path(full_path)) as f:
+                f.seek(start)
+                response = HttpResponse(f.read(end - start + 1), status=status.HTTP_206_PARTIAL_CONTENT, content_type=content_type)
+            response['Content-Range'] = f"bytes {start}-{end}/{info.size}"
+        else:
+            response = FileResponse(open_sample_file(Path(full_path)), content_type=content_type)
+
+    response['ETag'] = info.etag
+    response['Last-Modified'] = http_date(info.mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = IMAGE_CACHE_CONTROL
+    return response
+
+
+def _file_response(request, full_path, relative_path, accel_prefix):
+    """
+    Serve a file directly through Django in development, and in production hand it to Nginx.
+
+    In production the response only carries an X-Accel-Redirect header to an internal Nginx
+    location, which sends the file itself with sendfile once the request is authenticated.
+    Deployments without Nginx set an empty prefix to have Django serve the file. Files stored
+    in a dataset pack are always served by Django, straight from the memory-mapped pack.
+    """
+    if settings.DEBUG or not accel_prefix or pack_entry(Path(full_path)):
+        return _serve_file(request, full_path)
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    response = HttpResponse(content_type=content_type or 'application/octet-stream')
+    response['X-Accel-Redirect'] = quote(f"{accel_prefix}{relative_path}")
+    response['Cache-Control'] = IMAGE_CACHE_CONTROL
+    return response
+
+
+@lru_cache(maxsize=8192)
+def _stored_derivatives(source_path, size, version):
+    """
+    Return {format: path} of an image's stored derivatives of a size whose files exist.
+
+    Memoized per version of the derivatives table, which generate_derivatives bumps when it
+    writes rows, so image requests only query the table and stat the files again after that.
+    """
+    rows = EcgImageDerivative.objects.filter(source_path=source_path, variant=size).values_list('format', 'path')
+    return {fmt: path for fmt, path in rows if os.path.exists(os.path.join(settings.DERIVATIVES_DIR, path))}
+
+
+def _pick_derivative(request, source_path, size):
+    """Return the (path, format) of the best stored derivative for `size` that the client accepts."""
+    accept = request.headers.get('Accept', '')
+    formats = [fmt for fmt in ('avif', 'webp') if DERIVATIVE_CONTENT_TYPES[fmt] in accept]
+    if size == 'full' and not formats:
+        # The original PNG is the full-size PNG variant
+        return None
+
+    derivatives = _stored_derivatives(source_path, size, get_version('derivatives'))
+    for fmt in formats + ['png']:
+        if fmt in derivatives:
+            return derivatives[fmt], fmt
+    return None
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def serve_ecg_image(request, image_path):
     """
-    Serve ECG images - directly in development, redirect to Nginx in production.
-    """
-    # Normalize the path to prevent directory traversal attacks
-    normalized_path = os.path.normpath(image_path)
-    
-    # Remove any leading slashes to make the path relative
-    normalized_path = normalized_path.lstrip('/')
-    
-    # Add .png extension if not present
-    if not normalized_path.lower().endswith('.png'):
-        normalized_path += '.png'
-    
-    # Construct the full path for validation
-    full_path = os.path.join(settings.DATASET_SAMPLES_PATH, normalized_path)
-    
-    # Security check: ensure the path is within the dataset directory
-    if not os.path.abspath(full_path).startswith(os.path.abspath(settings.DATASET_SAMPLES_PATH)):
-        raise Http404("Invalid image path")
-    
-    # Check if file exists
-    if not os.path.exists(full_path):
-        raise Http404("Image not found")
-    
-    # Check if it's an image file
-    if not any(full_path.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']):
-        raise Http404("Invalid file type")
-    
-    if settings.DEBUG:
-        # In development, serve the file directly through Django
-        return FileResponse(open(full_path, 'rb'), content_type='image/png')
-    else:
-        # In production, redirect to Nginx
-        return HttpResponseRedirect(f'/ecg-images/{normalized_path}')
+    Serve ECG images - directly in development, through an Nginx X-Accel-Redirect in production.
+
+    The optional `size` query parameter ("thumb", "medium" or "full") and the Accept header
+    select a pre-generated derivative (AVIF/WebP/PNG) when one exists.
+    """
+    normalized_path, full_path = _resolve_image_path(str(settings.DATASET_SAMPLES_PATH), image_path)
+
+    size = request.query_params.get('size', 'full')
+    if size not in DERIVATIVE_VARIANTS:
+        return Response({'error': f"size must be one of {', '.join(DERIVATIVE_VARIANTS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    derivative = _pick_derivative(request, os.path.splitext(normalized_path)[0], size)
+    if derivative:
+        derivative_path = os.path.join(settings.DERIVATIVES_DIR, derivative[0])
+        response = _file_response(request, derivative_path, derivative[0], settings.DERIVATIVES_ACCEL_REDIRECT_PREFIX)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    return _file_response(request, full_path, normalized_path, settings.DATASET_ACCEL_REDIRECT_PREFIX)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def serve_ecg_render(request, sample_path):
+    """
+    Render the 12-lead sheet of an ECG sample from its signal at the requested size.
+
+    Query parameters: `width` (image width in pixels, 200-6000) and `dpi` (50-600, default 100).
+    Renders run in a process pool and are stored in a size-bounded disk cache. A render taking
+    longer than RENDER_TIMEOUT answers 503 with Retry-After, and is cached once it finishes.
+    """
+    record_path = resolve_sample_path(settings.DATASET_SAMPLES_PATH, sample_path)
+    if record_path is None:
+        raise Http404("Invalid sample path")
+    if record_path.suffix in (HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX):
+        record_path = record_path.with_suffix('')
+    if not sample_file_exists(record_path.with_suffix(HEADER_SUFFIX)) or not sample_file_exists(record_path.with_suffix(SIGNAL_SUFFIX)):
+        raise Http404("Signal not found")
+
+    width = request.query_params.get('width')
+    dpi = request.query_params.get('dpi', '100')
+    if width is not None and (not width.isdigit() or not 200 <= int(width) <= 6000):
+        return Response({'error': f"width must be an integer between 200 and 6000, got: {width}"}, status=status.HTTP_400_BAD_REQUEST)
+    if not dpi.isdigit() or not 50 <= int(dpi) <= 600:
+        return Response({'error': f"dpi must be an integer between 50 and 600, got: {dpi}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    cache = RenderCache(settings.RENDER_CACHE_DIR, settings.RENDER_CACHE_MAX_BYTES)
+    try:
+        path = render_cached(
+            cache, record_path, int(width) if width else None, int(dpi),
+            workers=settings.RENDER_WORKERS, timeout=settings.RENDER_TIMEOUT
+        )
+    except RenderTimeoutError:
+        # The render goes on in the pool and is cached when done
+        return Response({'error': 'Rendering in progress, try again shortly'}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': str(settings.RENDER_TIMEOUT)})
+    except BrokenProcessPool:
+        return Response({'error': 'Rendering failed, try again later'}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': str(settings.RENDER_TIMEOUT)})
 
+    return _serve_file(request, path, 'image/png')
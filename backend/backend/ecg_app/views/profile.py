@@ -8,12 +8,15 @@ from rest_framework.exceptions import PermissionDenied
 
 from ..models import Profile
 from ..serializers import ProfileSerializer
+from ..values_serializers import ProfileValuesSerializer
 from ..permissions import IsTeacherOrAdmin
+from ..renderers import FAST_RENDERER_CLASSES
 
 
 class ProfileViewSet(viewsets.ModelViewSet):
     serializer_class = ProfileSerializer
     permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
+    renderer_classes = FAST_RENDERER_CLASSES
 
     def get_queryset(self):
         user = self.request.user
@@ -33,6 +36,10 @@ class ProfileViewSet(viewsets.ModelViewSet):
         print(f"Returning {queryset.count()} profiles")
         return queryset.select_related('user')  # Add select_related to optimize query
 
+    def list(self, request, *args, **kwargs):
+        # Same output as ProfileSerializer, without instantiating every profile and user
+        return Response(ProfileValuesSerializer(self.filter_queryset(self.get_queryset())).data)
+
 
 class ProfileByUsernameView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
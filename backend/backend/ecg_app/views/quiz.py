@@ -1,8 +1,11 @@
+from django.http import HttpResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
@@ -11,6 +14,9 @@ from ..models import Quiz, Question, Choice, QuizAttempt, QuestionAttempt
 from ..serializers import QuizSerializer, QuizAttemptSerializer
 from ..quiz_generator import PersonalizedQuizGenerator
 from ..permissions import IsTeacherOrAdmin, IsOwnerOrTeacherOrAdmin
+from ..quiz_payload import get_quiz_payload
+from ..replica import read_from_replica
+from ..renderers import FAST_RENDERER_CLASSES
 
 
 # ---------------------------------------- [User and Quiz API views] ----------------------------------------
@@ -27,6 +33,36 @@ class QuizViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated(), IsTeacherOrAdmin()]
         return [IsAuthenticated()]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = self.get_serializer().optimize_queryset(queryset)
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        """Serve a quiz's cached payload, or 304 when the client already has it."""
+        # Only the full payload is cached, sparse fieldsets are serialized on demand
+        if 'fields' in request.query_params or 'expand' in request.query_params:
+            return super().retrieve(request, *args, **kwargs)
+
+        # Cached or not, the quiz must be visible and allowed; a lookup without the payload's prefetches
+        # is enough, and its pk keys the cache whatever the spelling of the URL ("05" or "5")
+        quiz = get_object_or_404(self.filter_queryset(Quiz.objects.only('pk')), pk=kwargs[self.lookup_field])
+        self.check_object_permissions(request, quiz)
+
+        def serialize():
+            return self.get_serializer(self.get_object()).data
+
+        payload = get_quiz_payload(quiz.pk, serialize)
+        response = get_conditional_response(request, etag=payload.etag)
+        if response is None:
+            response = HttpResponse(payload.content, content_type='application/json')
+        response['ETag'] = payload.etag
+        # Private, as quizzes are personalized. Clients revalidate every time, so an edited quiz is seen
+        # at once, and the ETag turns an unchanged quiz into an empty 304
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
     @action(detail=False, methods=['post'])
     def generate_random(self, request):
         """Generate a personalized quiz based on user's performance history."""
@@ -73,6 +109,12 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsOwnerOrTeacherOrAdmin]
 
     def get_queryset(self):
+        queryset = self._get_visible_attempts()
+        if self.action in ['list', 'retrieve']:
+            queryset = self.get_serializer().optimize_queryset(queryset)
+        return queryset
+
+    def _get_visible_attempts(self):
         user = self.request.user
         if user.is_staff:
             return QuizAttempt.objects.all()
@@ -84,7 +126,8 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
             ).distinct()
         return QuizAttempt.objects.filter(user=user)
 
-    @action(detail=False, methods=['get'], url_path='by-username/(?P<username>[^/.]+)')
+    @action(detail=False, methods=['get'], url_path='by-username/(?P<username>[^/.]+)', renderer_classes=FAST_RENDERER_CLASSES)
+    @read_from_replica
     def by_username(self, request, username=None):
         """Get all quiz attempts for a specific student."""
         try:
@@ -98,16 +141,9 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
 
-            # Get the user's quiz attempts
-            attempts = QuizAttempt.objects.filter(
-                user__username=username
-            ).select_related(
-                'quiz',
-                'user'
-            ).prefetch_related(
-                'question_attempts',
-                'question_attempts__question',
-                'question_attempts__selected_choice'
+            # Get the user's quiz attempts, with the relations of the requested fields
+            attempts = self.get_serializer().optimize_queryset(
+                QuizAttempt.objects.filter(user__username=username)
             ).order_by('-started_at')
 
             serializer = self.get_serializer(attempts, many=True)
@@ -155,7 +191,9 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
                     quiz_attempt=quiz_attempt,
                     question=question,
                     selected_choice=choice,
-                    is_correct=is_correct
+                    is_correct=is_correct,
+                    correct_label_id=question.correct_label_id,
+                    created_at=quiz_attempt.started_at
                 )
             except (Question.DoesNotExist, Choice.DoesNotExist):
                 continue
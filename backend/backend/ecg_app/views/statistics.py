@@ -6,6 +6,9 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 from ..models import QuizAttempt, QuestionAttempt, Question, EcgSamplesDocLabels, EcgDocLabels
+from ..catalog import get_doc_labels
+from ..replica import read_from_replica
+from ..versions import cached_view
 
 class UserStatisticsView(APIView):
     @staticmethod
@@ -45,7 +48,9 @@ class UserStatisticsView(APIView):
     def _get_question_attempts(user, start_date, quiz_limit):
         question_attempts = QuestionAttempt.objects.filter(quiz_attempt__user=user)
         if start_date:
-            question_attempts = question_attempts.filter(quiz_attempt__started_at__gte=start_date)
+            # A question attempt is never created before its quiz attempt started, and bounding
+            # created_at too lets PostgreSQL skip the older monthly partitions
+            question_attempts = question_attempts.filter(quiz_attempt__started_at__gte=start_date, created_at__gte=start_date)
         if quiz_limit:
             # Get the most recent quiz attempts and filter question attempts accordingly
             recent_quiz_attempts = QuizAttempt.objects.filter(user=user).order_by('-started_at')[:quiz_limit]
@@ -71,19 +76,21 @@ class UserStatisticsView(APIView):
     @staticmethod
     def _doc_class_statistics(question_attempts):
         doc_class_stats = []
-        doc_labels = EcgDocLabels.objects.all()
-        
-        for label in doc_labels:
-            questions_with_label = Question.objects.filter(
-                ecg_sample__doc_labels__label_id=label
-            )
-            
-            attempts = question_attempts.filter(
-                question__in=questions_with_label
+        doc_labels = get_doc_labels()
+
+        # One group-by over the attempts, on the label stored with each attempt
+        counts = {
+            row['correct_label']: row
+            for row in question_attempts.order_by().values('correct_label').annotate(
+                total=Count('id'),
+                correct=Count('id', filter=Q(is_correct=True))
             )
-            
-            total_attempts = attempts.count()
-            correct_attempts = attempts.filter(is_correct=True).count()
+        }
+
+        for label in doc_labels:
+            label_counts = counts.get(label.label_id, {})
+            total_attempts = label_counts.get('total', 0)
+            correct_attempts = label_counts.get('correct', 0)
             
             accuracy = (correct_attempts / total_attempts * 100) if total_attempts > 0 else 0
                 
@@ -96,6 +103,9 @@ class UserStatisticsView(APIView):
             
         return doc_class_stats
 
+    # Short timeout, as days_limit windows move with time
+    @cached_view('quiz_attempt', 'doc_labels', scope_user=lambda request, user_id: user_id, vary_on_user=False, timeout=5 * 60)
+    @read_from_replica
     def get(self, request, user_id):
         # Get the user
         try:
@@ -4,8 +4,9 @@ from django.contrib.auth.models import User
 from django.shortcuts import render
 
 from ..models import (
-    EcgSamples, EcgSnomed, EcgSamplesSnomed, User, Quiz, QuizAttempt
+    EcgSamples, EcgSamplesSnomed, User, Quiz, QuizAttempt
 )
+from ..catalog import get_snomed_codes
 
 
 ITEMS_PER_PAGE = 50
@@ -38,7 +39,7 @@ def view_ecg_samples(request):
 
 
 def view_ecg_snomed(request):
-    snomed_labels = EcgSnomed.objects.all()
+    snomed_labels = get_snomed_codes()
     
     # Pagination logic
     paginator = Paginator(snomed_labels, ITEMS_PER_PAGE)  # 100 items per page
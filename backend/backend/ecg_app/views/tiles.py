@@ -0,0 +1,100 @@
+import os
+from functools import partial
+from concurrent.futures import TimeoutError as RenderTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from ..data_utils.render import run_in_render_pool, submit_to_render_pool
+from ..data_utils.sample import HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX, resolve_sample_path
+from ..data_utils.tiles import TILE_CONTENT_TYPES, build_tile_pack, open_tile_pack, tile_pack_path, tile_source_mtime
+
+# Tiles never change for a given pack; a rebuilt pack is only picked up after the max-age
+TILE_CACHE_CONTROL = 'private, max-age=86400'
+
+
+def _get_tile_pack(sample_path):
+    """
+    Return the tile pack of a record, building it in the render pool on first use.
+
+    The request waits at most RENDER_TIMEOUT for a new pack, and TimeoutError is raised while
+    the build goes on in the background. A pack older than its source image or signal is still
+    served, while it's checked against the source hash in the background and rebuilt when the
+    content changed, or else touched so the source isn't hashed again.
+    """
+    record_path = resolve_sample_path(settings.DATASET_SAMPLES_PATH, sample_path)
+    if record_path is None:
+        raise Http404("Invalid sample path")
+    if record_path.suffix in (HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX):
+        record_path = record_path.with_suffix('')
+
+    source_path = os.path.relpath(record_path, settings.DATASET_SAMPLES_PATH)
+    pack_path = tile_pack_path(settings.TILES_DIR, source_path)
+    pack = open_tile_pack(pack_path)
+    source_mtime = tile_source_mtime(record_path)
+    if source_mtime is None:
+        raise Http404("Sample not found")
+    if pack is None:
+        run_in_render_pool(settings.RENDER_WORKERS, settings.RENDER_TIMEOUT, build_tile_pack, record_path, pack_path)
+        pack = open_tile_pack(pack_path)
+    elif source_mtime > pack_path.stat().st_mtime:
+        submit_to_render_pool(
+            settings.RENDER_WORKERS, build_tile_pack, record_path, pack_path, pack.format,
+            on_result=partial(_touch_unchanged_pack, pack_path)
+        )
+    return pack
+
+
+def _touch_unchanged_pack(pack_path, rebuilt):
+    if not rebuilt:
+        os.utime(pack_path)
+
+
+def _tiling_unavailable(message):
+    return Response({'error': message}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': str(settings.RENDER_TIMEOUT)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def serve_ecg_tile_descriptor(request, sample_path):
+    """
+    Serve the Deep Zoom (.dzi) descriptor of an ECG sample's tile pyramid.
+
+    Tiles are served next to it under "<sample_path>_files/<level>/<col>_<row>.<format>",
+    the layout Deep Zoom viewers such as OpenSeadragon derive from the descriptor URL.
+    """
+    try:
+        pack = _get_tile_pack(sample_path)
+    except RenderTimeoutError:
+        return _tiling_unavailable('Tiling in progress, try again shortly')
+    except BrokenProcessPool:
+        return _tiling_unavailable('Tiling failed, try again later')
+
+    response = HttpResponse(pack.dzi(), content_type='application/xml')
+    response['Cache-Control'] = TILE_CACHE_CONTROL
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def serve_ecg_tile(request, sample_path, level, col, row, fmt):
+    """Serve one tile of an ECG sample's pyramid, sliced straight out of the memory-mapped pack."""
+    try:
+        pack = _get_tile_pack(sample_path)
+    except RenderTimeoutError:
+        return _tiling_unavailable('Tiling in progress, try again shortly')
+    except BrokenProcessPool:
+        return _tiling_unavailable('Tiling failed, try again later')
+
+    tile = pack.tile(level, col, row) if fmt == pack.format else None
+    if tile is None:
+        raise Http404("Tile not found")
+
+    response = HttpResponse(tile, content_type=TILE_CONTENT_TYPES[pack.format])
+    response['Cache-Control'] = TILE_CACHE_CONTROL
+    return response
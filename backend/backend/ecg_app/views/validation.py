@@ -5,7 +5,12 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from ..models import EcgSampleValidation, ValidationHistory, EcgSamples, EcgDocLabels, EcgSamplesDocLabels
 from ..serializers import EcgSampleValidationSerializer
+from ..values_serializers import PendingSampleValuesSerializer, ValidatedSampleValuesSerializer
+from ..renderers import FAST_RENDERER_CLASSES
 from ..permissions import IsTeacherOrAdmin
+from ..catalog import get_doc_labels
+from ..replica import read_from_replica
+from ..versions import cached_view
 from rest_framework.permissions import IsAuthenticated
 import logging
 from rest_framework import serializers
@@ -38,7 +43,7 @@ class EcgSampleValidationViewSet(viewsets.ModelViewSet):
     def all_labels(self, request):
         """Get all possible label ids and descriptions."""
         try:
-            labels = list(EcgDocLabels.objects.values('label_id', 'label_desc'))
+            labels = [{'label_id': label.label_id, 'label_desc': label.label_desc} for label in get_doc_labels()]
             return Response({'labels': labels})
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -80,77 +85,20 @@ class EcgSampleValidationViewSet(viewsets.ModelViewSet):
             comment=self.request.data.get('comment', '')
         )
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=FAST_RENDERER_CLASSES)
     def pending_samples(self, request):
         """Get all ECG samples that haven't been validated."""
-        # Get all samples that haven't been validated
-        pending_samples = EcgSampleValidation.objects.filter(have_been_validated=False)
-        
-        response_data = {
-            'count': pending_samples.count(),
-            'samples': [
-                {
-                    'id': validation.id,  # Use validation's own ID
-                    'sample_id': validation.sample.sample_id,
-                    'path': validation.sample.sample_path,
-                    'prev_tag': {
-                        'label_id': validation.prev_tag.label_id,
-                        'label_desc': validation.prev_tag.label_desc
-                    } if validation.prev_tag else None,
-                    'new_tag': {
-                        'label_id': validation.new_tag.label_id,
-                        'label_desc': validation.new_tag.label_desc
-                    } if validation.new_tag else None
-                }
-                for validation in pending_samples
-            ]
-        }
-        
-        return Response(response_data)
-    
-    @action(detail=False, methods=['get'])
+        samples = PendingSampleValuesSerializer(EcgSampleValidation.objects.filter(have_been_validated=False)).data
+        return Response({'count': len(samples), 'samples': samples})
+
+    @action(detail=False, methods=['get'], renderer_classes=FAST_RENDERER_CLASSES)
+    @cached_view('validation', 'doc_labels', 'user', vary_on_user=False)
+    @read_from_replica
     def validated_samples(self, request):
         """Get all ECG samples that have been validated."""
-        validated_samples = EcgSampleValidation.objects.filter(have_been_validated=True)
-        logger.info(f'Found {validated_samples.count()} validated samples')
-        
-        response_data = {
-            'count': validated_samples.count(),
-            'samples': [
-                {
-                    'id': validation.id,  # Use validation's own ID
-                    'sample_id': validation.sample.sample_id,
-                    'path': validation.sample.sample_path,
-                    'prev_tag': {
-                        'label_id': validation.prev_tag.label_id,
-                        'label_desc': validation.prev_tag.label_desc
-                    } if validation.prev_tag else None,
-                    'new_tag': {
-                        'label_id': validation.new_tag.label_id,
-                        'label_desc': validation.new_tag.label_desc
-                    } if validation.new_tag else None,
-                    'history': [
-                        {
-                            'validated_by': hist.validated_by.username,
-                            'prev_tag': {
-                                'label_id': hist.prev_tag.label_id,
-                                'label_desc': hist.prev_tag.label_desc
-                            } if hist.prev_tag else None,
-                            'new_tag': {
-                                'label_id': hist.new_tag.label_id,
-                                'label_desc': hist.new_tag.label_desc
-                            } if hist.new_tag else None,
-                            'comment': hist.comment,
-                            'created_at': hist.created_at
-                        }
-                        for hist in validation.history.all().order_by('-created_at')
-                    ]
-                }
-                for validation in validated_samples
-            ]
-        }
-        logger.info(f'Returning response with {len(response_data["samples"])} samples')
-        return Response(response_data)
+        samples = ValidatedSampleValuesSerializer(EcgSampleValidation.objects.filter(have_been_validated=True)).data
+        logger.info(f'Returning response with {len(samples)} validated samples')
+        return Response({'count': len(samples), 'samples': samples})
 
     @action(detail=True, methods=['patch'])
     def validate(self, request, pk=None):
@@ -0,0 +1,148 @@
+import gzip
+import math
+
+import numpy as np
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from ..data_utils.downsample import LOD_METHODS, downsample, load_lod_level, lod_width
+from ..data_utils.pack import sample_file_exists
+from ..data_utils.sample import HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX, resolve_sample_path
+from ..data_utils.signal import load_signal, pack_waveform
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+WAVEFORM_DTYPES = ('int16', 'float16')
+
+
+def _parse_float(value, name):
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        number = math.nan
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a number, got: {value}")
+    return number
+
+
+def _compress(body, accept_encoding):
+    """Compress the payload with the best encoding the client accepts."""
+    if brotli is not None and 'br' in accept_encoding:
+        return brotli.compress(body, quality=5), 'br'
+    if 'gzip' in accept_encoding:
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def serve_ecg_waveform(request, sample_path):
+    """
+    Serve the signal of an ECG sample as a compact binary payload.
+
+    Query parameters:
+        leads: comma-separated lead names (e.g. "I,II,V1"), all leads by default.
+        dtype: "int16" for raw ADC samples (default) or "float16" for values in physical units.
+        start, stop: time window in seconds, the whole record by default.
+        width: target plot width in pixels. Windows with more samples are downsampled.
+        method: "minmax" (per-pixel min/max envelope, default) or "lttb".
+
+    Whole-record downsampled levels are rounded up to a fixed LOD ladder and cached on
+    disk, so overview plots cost a few KB. Zoomed-in windows that fit in `width` are sent
+    at full resolution.
+
+    Downsampled payloads describe their level in `lod`. A minmax envelope has a (min, max)
+    pair per bucket, bucket i covering samples start + floor(i * (stop - start) / lod.width)
+    up to the next bucket's; LTTB points come with their sample indices in `index`.
+
+    The payload is a small JSON metadata header followed by the sample arrays, see
+    `pack_waveform`. It is compressed with brotli or gzip when the client accepts it.
+    """
+    record_path = resolve_sample_path(settings.DATASET_SAMPLES_PATH, sample_path)
+    if record_path is None:
+        raise Http404("Invalid sample path")
+    if record_path.suffix in (HEADER_SUFFIX, SIGNAL_SUFFIX, IMAGE_SUFFIX):
+        record_path = record_path.with_suffix('')
+    if not sample_file_exists(record_path.with_suffix(HEADER_SUFFIX)) or not sample_file_exists(record_path.with_suffix(SIGNAL_SUFFIX)):
+        raise Http404("Signal not found")
+
+    dtype = request.query_params.get('dtype', 'int16')
+    if dtype not in WAVEFORM_DTYPES:
+        return Response({'error': f"dtype must be one of {', '.join(WAVEFORM_DTYPES)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    method = request.query_params.get('method', 'minmax')
+    if method not in LOD_METHODS:
+        return Response({'error': f"method must be one of {', '.join(LOD_METHODS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        signal = load_signal(record_path)
+    except FileNotFoundError:
+        raise Http404("Signal not found")
+    except (OSError, ValueError, IndexError) as e:
+        return Response({'error': f"Unreadable signal record: {e}"}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    leads = request.query_params.get('leads')
+    lead_rows = list(range(signal.header.num_leads))
+    try:
+        if leads:
+            lead_rows = [signal.lead_index(lead.strip()) for lead in leads.split(',')]
+        window = signal.time_slice(
+            _parse_float(request.query_params.get('start'), 'start'),
+            _parse_float(request.query_params.get('stop'), 'stop')
+        )
+        width = request.query_params.get('width')
+        if width is not None:
+            if not width.isdigit() or int(width) <= 0:
+                raise ValueError(f"width must be a positive integer, got: {width}")
+            width = int(width)
+    except (KeyError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    start, stop, _ = window.indices(len(signal))
+    stop = max(start, stop)
+    lod = None
+    if width is not None and stop - start > 2 * width:
+        level = lod_width(width) if (start, stop) == (0, len(signal)) else None
+        if level is not None:
+            arrays = load_lod_level(record_path, signal, level, method)
+        else:
+            arrays = downsample(signal.digital[:, start:stop], width, method)
+        arrays = {name: array[lead_rows] for name, array in arrays.items()}
+        lod = {'method': method, 'width': level or width}
+    else:
+        arrays = {'samples': signal.window(lead_rows, start, stop)}
+
+    specs = [signal.header.leads[row] for row in lead_rows]
+    if dtype == 'float16':
+        arrays['samples'] = signal.to_physical(arrays['samples'], lead_rows).astype(np.float16)
+
+    metadata = {
+        'record': signal.header.record_name,
+        'fs': signal.fs,
+        'num_samples': len(signal),
+        'leads': [spec.name for spec in specs],
+        'units': [spec.units for spec in specs],
+        'gain': [spec.gain for spec in specs],
+        'baseline': [spec.baseline for spec in specs],
+        'start': start,
+        'stop': stop,
+        'lod': lod,
+    }
+    body, encoding = _compress(pack_waveform(metadata, arrays), request.headers.get('Accept-Encoding', ''))
+
+    response = HttpResponse(body, content_type='application/octet-stream')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -96,6 +96,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',
+    'ecg_app.replica.ReplicaStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'ecg_backend.urls'
@@ -130,9 +131,38 @@ DATABASES = {
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': 'database',
         'PORT': '5432',
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Database connections are pooled per gunicorn worker (psycopg 3), or kept open between requests
+# when DATABASE_POOL_MAX_SIZE is 0, so requests don't pay for a new connection and its handshakes
+DATABASE_POOL_MAX_SIZE = int(os.getenv('DATABASE_POOL_MAX_SIZE', 2))
+if DATABASE_POOL_MAX_SIZE > 0:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', 1)),
+            'max_size': DATABASE_POOL_MAX_SIZE,
+            'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),  # Seconds to wait for a free connection
+        }
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DATABASE_CONN_MAX_AGE', 60))
+
+# Optional read replica for the read-heavy statistics, history and listing endpoints
+if os.getenv('DATABASE_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DATABASE_REPLICA_HOST'),
+        'PORT': os.getenv('DATABASE_REPLICA_PORT', '5432'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['ecg_app.replica.ReplicaRouter']
+# Seconds a client's reads stay on the primary after it writes, to cover replication lag
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+# Longest a cached response computed on the replica is served, which bounds its staleness
+REPLICA_CACHE_TIMEOUT = int(os.getenv('REPLICA_CACHE_TIMEOUT', 60))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -174,6 +204,37 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Dataset samples path configuration
 DATASET_SAMPLES_PATH = BASE_DIR.parent.parent / 'dataset'
 
+# Generated files cache configuration (rendered ECG images, image derivatives)
+CACHE_ROOT = Path(os.getenv('CACHE_ROOT', BASE_DIR / 'cache'))
+RENDER_CACHE_DIR = CACHE_ROOT / 'renders'
+DERIVATIVES_DIR = CACHE_ROOT / 'derivatives'
+TILES_DIR = CACHE_ROOT / 'tiles'
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', 2))
+# Longest a request waits on the render pool, well under gunicorn's 30 s worker timeout; slower tasks finish in the background
+RENDER_TIMEOUT = int(os.getenv('RENDER_TIMEOUT', 10))
+
+# Cache shared by all gunicorn workers of the host, or by all hosts with Redis (needs the redis package)
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_ROOT / 'django',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000))},
+        }
+    }
+
+# Internal Nginx locations that serve dataset images and derivatives via X-Accel-Redirect in production
+DATASET_ACCEL_REDIRECT_PREFIX = os.getenv('DATASET_ACCEL_REDIRECT_PREFIX', '/protected-ecg-images/')
+DERIVATIVES_ACCEL_REDIRECT_PREFIX = os.getenv('DERIVATIVES_ACCEL_REDIRECT_PREFIX', '/protected-ecg-derivatives/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -77,13 +77,9 @@ export const getImageUrl = (path) => {
     // Clean the path by removing leading slashes and dataset/ prefix
     const cleanPath = path.replace(/^\/?(dataset\/)?/, '');
 
-    // If we're in development mode, use the API base URL
-    if (process.env.REACT_APP_DEBUG === 'true') {
-        return `${API_BASE_URL}/images/${encodeURIComponent(cleanPath)}`;
-    }
-    
-    // Join path segments without encoding slashes
-    return `/ecg-images/${cleanPath}`;
+    // Images are always requested through the authenticated API; in production the
+    // backend hands the file transfer over to Nginx with X-Accel-Redirect
+    return `${API_BASE_URL}/images/${cleanPath.split('/').map(encodeURIComponent).join('/')}`;
 };
 
 // Export the getCsrfToken function for direct use